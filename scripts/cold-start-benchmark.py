@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""
+Cold start benchmark for the apb command line tool.
+
+Every measurement runs in a fresh interpreter so module caches are cold. The
+benchmark is fully offline: a throwaway kubeconfig points at an unroutable
+cluster, and the first socket connect or subprocess spawn made by a
+subcommand is intercepted and counted as its "first request". Nothing ever
+reaches a cluster, a broker or a docker daemon.
+
+Measured:
+  * interpreter start            python -c pass
+  * import:<module>              import apb.cli, import apb.engine
+  * argparse                     first ArgumentParser() up to parse_args(),
+                                 i.e. building the parser for `apb help`
+  * first_request:<subcommand>   process start until the first real work
+
+Usage:
+  scripts/cold-start-benchmark.py                   # compare with baseline
+  scripts/cold-start-benchmark.py --save-baseline   # record a new baseline
+
+Timings depend on the machine, so the baseline is recorded locally and not
+committed. Comparing without one fails rather than passing silently.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC_PATH = os.path.join(os.path.dirname(HERE), 'src')
+DEFAULT_BASELINE = os.path.join(HERE, 'cold-start-baseline.json')
+
+IMPORT_MODULES = ['apb.cli', 'apb.engine']
+
+# Unroutable broker so list/remove/bootstrap fail at their first connect
+BROKER = 'https://127.0.0.1:9'
+
+# Subcommand arguments, {project} is replaced with a generated APB project
+SUBCOMMANDS = [
+    ('help', ['help']),
+    ('version', ['version']),
+    ('init', ['init', 'bench/bench-apb', '--force']),
+    ('prepare', ['--project', '{project}', 'prepare']),
+    ('serviceinstance', ['--project', '{project}', 'serviceinstance']),
+    ('build', ['--project', '{project}', 'build']),
+    ('list', ['list', '--broker', BROKER]),
+    ('bootstrap', ['bootstrap', '--broker', BROKER, '--no-relist']),
+    ('remove', ['remove', '--broker', BROKER, '--id', 'bench', '--no-relist']),
+    ('relist', ['relist']),
+    ('refresh', ['refresh', '--no-relist']),
+    ('validate', ['--project', '{project}', 'validate']),
+    ('push', ['--project', '{project}', 'push', '--broker', BROKER]),
+    ('test', ['--project', '{project}', 'test']),
+    ('run', ['--project', '{project}', 'run', '--project', 'bench']),
+    ('setup', ['setup']),
+]
+
+KUBECONFIG = """apiVersion: v1
+kind: Config
+clusters:
+- cluster:
+    insecure-skip-tls-verify: true
+    server: https://127.0.0.1:9
+  name: bench
+contexts:
+- context:
+    cluster: bench
+    namespace: default
+    user: bench
+  name: bench
+current-context: bench
+users:
+- name: bench
+  user:
+    token: bench-token
+"""
+
+# Runs inside the child interpreter. The first socket connect or subprocess
+# spawn raises FirstRequest, which derives from BaseException so the
+# `except Exception` handlers in apb do not swallow it.
+CHILD = """
+import sys, time, json, socket, argparse, subprocess
+start = float(sys.argv[1])
+result = {}
+
+class FirstRequest(BaseException):
+    pass
+
+def first_request(kind):
+    def hook(*args, **kwargs):
+        result.setdefault('first_request', time.time() - start)
+        result.setdefault('kind', kind)
+        raise FirstRequest(kind)
+    return hook
+
+socket.socket.connect = first_request('socket')
+socket.socket.connect_ex = first_request('socket')
+subprocess.Popen.__init__ = first_request('subprocess')
+
+parser_init = argparse.ArgumentParser.__init__
+def timed_parser_init(self, *args, **kwargs):
+    result.setdefault('parser_start', time.time())
+    return parser_init(self, *args, **kwargs)
+argparse.ArgumentParser.__init__ = timed_parser_init
+
+parse_args = argparse.ArgumentParser.parse_args
+def timed_parse_args(self, *args, **kwargs):
+    result.setdefault('argparse', time.time() - result.get('parser_start', start))
+    return parse_args(self, *args, **kwargs)
+argparse.ArgumentParser.parse_args = timed_parse_args
+
+import apb.cli
+result['import'] = time.time() - start
+sys.argv = ['apb'] + sys.argv[2:]
+try:
+    apb.cli.main()
+except (FirstRequest, SystemExit, Exception):
+    pass
+result['total'] = time.time() - start
+sys.stdout = sys.__stdout__
+print('BENCH ' + json.dumps(result))
+"""
+
+
+def child_env(workdir):
+    kubeconfig = os.path.join(workdir, 'kubeconfig')
+    if not os.path.exists(kubeconfig):
+        with open(kubeconfig, 'w') as f:
+            f.write(KUBECONFIG)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_PATH, env.get('PYTHONPATH')]))
+    env['KUBECONFIG'] = kubeconfig
+    env['HOME'] = workdir
+    for var in ['DOCKER_HOST', 'DOCKER_CERT_PATH', 'MINISHIFT_REGISTRY']:
+        env.pop(var, None)
+    return env
+
+
+def run_child(args, env, cwd):
+    devnull = open(os.devnull, 'w')
+    start = time.time()
+    try:
+        output = subprocess.check_output(
+            [sys.executable, '-c', CHILD, repr(start)] + args,
+            env=env, cwd=cwd, stderr=devnull
+        )
+    except subprocess.CalledProcessError as e:
+        output = e.output
+    finally:
+        devnull.close()
+
+    for line in output.decode('utf-8', 'replace').splitlines():
+        if line.startswith('BENCH '):
+            return json.loads(line[len('BENCH '):])
+    return None
+
+
+def timed(cmd, env, cwd):
+    devnull = open(os.devnull, 'w')
+    start = time.time()
+    try:
+        subprocess.check_call(cmd, env=env, cwd=cwd, stderr=devnull)
+    finally:
+        devnull.close()
+    return time.time() - start
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def collect(repeat, workdir):
+    env = child_env(workdir)
+    results = {}
+
+    results['interpreter'] = median(
+        [timed([sys.executable, '-c', 'pass'], env, workdir) for _ in range(repeat)]
+    )
+
+    for module in IMPORT_MODULES:
+        cmd = [sys.executable, '-c', 'import %s' % module]
+        try:
+            results['import:%s' % module] = median([timed(cmd, env, workdir) for _ in range(repeat)])
+        except subprocess.CalledProcessError:
+            print("Skipping import:%s, module failed to import" % module)
+
+    # Generate a project once for the subcommands that need one
+    subprocess.check_call(
+        [sys.executable, '-c', 'import apb.cli; apb.cli.main()', 'init', 'bench/bench-apb'],
+        env=env, cwd=workdir, stdout=open(os.devnull, 'w')
+    )
+    project = os.path.join(workdir, 'bench-apb')
+
+    for name, args in SUBCOMMANDS:
+        args = [arg.replace('{project}', project) for arg in args]
+        runs = [run_child(args, env, workdir) for _ in range(repeat)]
+        runs = [run for run in runs if run]
+        if not runs:
+            print("Skipping %s, no measurement was reported" % name)
+            continue
+        if name == 'help':
+            results['argparse'] = median([run['argparse'] for run in runs])
+        first = [run.get('first_request', run['total']) for run in runs]
+        results['first_request:%s' % name] = median(first)
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    regressions = []
+    print("%-34s %12s %12s %9s" % ("METRIC", "CURRENT(ms)", "BASELINE(ms)", "CHANGE"))
+    for metric in sorted(results):
+        current = results[metric] * 1000
+        if metric not in baseline:
+            print("%-34s %12.1f %12s %9s" % (metric, current, "-", "-"))
+            continue
+        previous = baseline[metric] * 1000
+        change = (current - previous) / previous * 100 if previous else 0.0
+        flag = ""
+        if current > previous * (1 + tolerance) and current - previous > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        print("%-34s %12.1f %12.1f %8.1f%%%s" % (metric, current, previous, change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'Offline cold start benchmark for apb subcommands.')
+    parser.add_argument('--repeat', type=int, default=5, help=u'Runs per measurement, the median is kept')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=u'Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', default=False,
+                        help=u'Write the results as the new baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help=u'Allowed relative slowdown before reporting a regression')
+    parser.add_argument('--min-delta', type=float, default=10.0,
+                        help=u'Ignore slowdowns smaller than this many milliseconds')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='apb-bench-')
+    try:
+        results = collect(args.repeat, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        compare(results, {}, args.tolerance, args.min_delta)
+        print("Saved baseline to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        compare(results, {}, args.tolerance, args.min_delta)
+        print("No baseline found at %s, run with --save-baseline first." % args.baseline)
+        return 2
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print("Regressions: %s" % ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for loading apb.yml specs.
+
+Generates a spec with many plans and parameters and times the loader
+apb.spec uses for it against the alternatives:
+  * round_trip     YAML(), the loader specs used to be read with
+  * safe           YAML(typ='safe') through apb.spec, libyaml C parser
+                   when ruamel.yaml's C extension is installed
+  * safe_pure      YAML(typ='safe', pure=True), the fallback without it
+
+Usage:
+  scripts/spec-load-benchmark.py
+  scripts/spec-load-benchmark.py --plans 50 --parameters 100 --repeat 5
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+from ruamel.yaml import YAML  # noqa: E402
+
+from apb.spec import load_spec_dict  # noqa: E402
+
+PLAN = """- name: plan-{plan}
+  description: Plan {plan} of the benchmark APB
+  free: true
+  metadata:
+    displayName: Plan {plan}
+    longDescription: Generated plan used to measure spec load time
+    cost: $0.00
+  parameters:
+"""
+
+PARAMETER = """  - name: parameter_{parameter}
+    title: Parameter {parameter}
+    type: string
+    default: value-{parameter}
+    required: false
+    display_group: Group {group}
+"""
+
+
+def generate_spec(plans, parameters):
+    lines = [
+        "version: 1.0\n",
+        "name: benchmark-apb\n",
+        "description: Generated APB for the spec load benchmark\n",
+        "bindable: false\n",
+        "async: optional\n",
+        "metadata:\n",
+        "  displayName: Benchmark (APB)\n",
+        "plans:\n",
+    ]
+    for plan in range(plans):
+        lines.append(PLAN.format(plan=plan))
+        for parameter in range(parameters):
+            lines.append(PARAMETER.format(parameter=parameter, group=parameter // 10))
+    return ''.join(lines)
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=u'Time the apb.yml loaders on a generated spec.')
+    parser.add_argument('--plans', type=int, default=20, help=u'Plans in the generated spec')
+    parser.add_argument('--parameters', type=int, default=50, help=u'Parameters per plan')
+    parser.add_argument('--repeat', type=int, default=3, help=u'Runs per loader, the fastest is kept')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='apb-spec-bench-')
+    try:
+        spec_path = os.path.join(workdir, 'apb.yml')
+        with open(spec_path, 'w') as spec_file:
+            spec_file.write(generate_spec(args.plans, args.parameters))
+
+        with open(spec_path, 'r') as spec_file:
+            content = spec_file.read()
+
+        loaders = [
+            ('round_trip', lambda: YAML().load(content)),
+            ('safe', lambda: load_spec_dict(spec_path)),
+            ('safe_pure', lambda: YAML(typ='safe', pure=True).load(content)),
+        ]
+
+        print("Spec with %d plans x %d parameters, %d KiB" %
+              (args.plans, args.parameters, os.path.getsize(spec_path) // 1024))
+        print("libyaml C parser: %s" % ('yes' if YAML(typ='safe').Parser.__name__ == 'CParser' else 'no'))
+        results = [(name, best_of(args.repeat, loader)) for name, loader in loaders]
+        baseline = results[0][1]
+        print("%-12s %10s %9s" % ("LOADER", "TIME(ms)", "SPEEDUP"))
+        for name, seconds in results:
+            print("%-12s %10.1f %8.1fx" % (name, seconds * 1000, baseline / seconds if seconds else 0.0))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
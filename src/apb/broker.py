@@ -0,0 +1,277 @@
+""" broker module with helpers that talk to the Ansible Service Broker """
+import os
+import time
+import base64
+import random
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+from apb.cache import FileCache
+from apb.cluster import get_asb_route, get_cluster_context, invalidate_asb_route
+from apb.util import debug
+
+# Disable insecure request warnings from requests
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+# Overrides the number of retries for failed broker requests
+RETRIES_ENV = 'APB_BROKER_RETRIES'
+# Overrides the seconds to wait for a broker response
+TIMEOUT_ENV = 'APB_BROKER_TIMEOUT'
+DEFAULT_RETRIES = 3
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+# Bootstrapping reloads every registry, the broker answers when it is done
+BOOTSTRAP_READ_TIMEOUT = 600
+# Methods that are safe to send again when the first attempt may have arrived
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT']
+DEFAULT_POOL_SIZE = 10
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+RETRY_STATUS_CODES = [502, 503, 504]
+# Cache of broker catalogs read by `apb list`
+CATALOG_CACHE = 'catalogs'
+# Cache key prefix of catalogs of brokers found through the cluster route
+DISCOVERED_BROKER = 'discovered'
+
+
+class BrokerClient(object):
+    """
+    Keep-alive HTTP client shared by every broker and service catalog call.
+
+    Idempotent requests that fail to connect, time out or come back with a
+    gateway error are retried with jittered exponential backoff, other
+    methods only when the caller passes retry=True. Every request gets a
+    (connect, read) `timeout` unless the caller passes its own. Every
+    attempt is timed in the debug output.
+    """
+    def __init__(self, retries=None, pool_size=DEFAULT_POOL_SIZE, backoff=BACKOFF_BASE, timeout=None):
+        if retries is None:
+            retries = int(os.environ.get(RETRIES_ENV, DEFAULT_RETRIES))
+        if timeout is None:
+            timeout = (CONNECT_TIMEOUT, float(os.environ.get(TIMEOUT_ENV, READ_TIMEOUT)))
+        elif not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(BACKOFF_MAX, self.backoff * (2 ** attempt)))
+
+    def request(self, method, url, retry=None, **kwargs):
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        retries = self.retries if retry else 0
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            start = time.time()
+            error = None
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            elapsed = time.time() - start
+
+            status = response.status_code if response is not None else None
+            debug("%s %s -> %s in %.3fs" % (method.upper(), url, status or error, elapsed))
+
+            if error is None and status not in RETRY_STATUS_CODES:
+                return response
+            if attempt >= retries:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                # Hand a streamed connection back to the pool before retrying
+                response.close()
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            print("Broker request failed (%s), retrying in %.1fs [%d/%d]" %
+                  (status or error, delay, attempt, retries))
+            time.sleep(delay)
+
+
+_broker_client = None
+_broker_client_lock = threading.Lock()
+
+
+def get_broker_client():
+    global _broker_client
+    with _broker_client_lock:
+        if _broker_client is None:
+            _broker_client = BrokerClient()
+        return _broker_client
+
+
+def broker_resource_url(host, broker_name):
+    return "{}/apis/servicecatalog.k8s.io/v1beta1/clusterservicebrokers/{}".format(host, broker_name)
+
+
+def relist_service_broker(kwargs):
+    try:
+        cluster = get_cluster_context()
+        token = cluster.api_key()
+        cluster_host = cluster.host()
+        broker_name = kwargs['broker_name']
+        headers = {}
+        if kwargs['basic_auth_username'] is not None and kwargs['basic_auth_password'] is not None:
+            headers = {'Authorization': "Basic " +
+                       base64.b64encode("{0}:{1}".format(kwargs['basic_auth_username'],
+                                                         kwargs['basic_auth_password']))
+                       }
+        elif kwargs['auth_token'] is not None:
+            headers = {'Authorization': "Bearer " + kwargs['auth_token']}
+        else:
+            headers = {'Authorization': token}
+
+        if kwargs["cert"] is not None:
+            verify = kwargs["cert"]
+        else:
+            verify = kwargs["verify"]
+
+        response = get_broker_client().request(
+            "get",
+            broker_resource_url(cluster_host, broker_name),
+            verify=verify, headers=headers)
+
+        if response.status_code != 200:
+            errMsg = "Received non-200 status code while retrieving broker: {}\n".format(broker_name) + \
+                "Response body:\n" + \
+                str(response.text)
+            raise Exception(errMsg)
+
+        spec = response.json().get('spec', None)
+        if spec is None:
+            errMsg = "Spec not found in broker reponse. Response body: \n{}".format(response.text)
+            raise Exception(errMsg)
+
+        relist_requests = spec.get('relistRequests', None)
+        if relist_requests is None:
+            errMsg = "relistRequests not found within the spec of broker: {}\n".format(broker_name) + \
+                     "Are you sure you are using a ServiceCatalog of >= v0.0.21?"
+            raise Exception(errMsg)
+
+        inc_relist_requests = relist_requests + 1
+
+        headers['Content-Type'] = 'application/strategic-merge-patch+json'
+        response = get_broker_client().request(
+            "patch",
+            broker_resource_url(cluster_host, broker_name),
+            json={'spec': {'relistRequests': inc_relist_requests}},
+            verify=verify, headers=headers, retry=True)
+
+        if response.status_code != 200:
+            errMsg = "Received non-200 status code while patching relistRequests of broker: {}\n".format(
+                broker_name) + \
+                "Response body:\n{}".format(str(response.text))
+            raise Exception(errMsg)
+
+        print("Successfully relisted the Service Catalog")
+    except Exception as e:
+        print("Relist failure: {}".format(e))
+
+
+def broker_request(broker, service_route, method, **kwargs):
+    if broker is None:
+        broker = get_asb_route()
+
+    if broker is None:
+        raise Exception("Could not find route to ansible-service-broker. "
+                        "Use --broker or log into the cluster using \"oc login\"")
+
+    if not broker.startswith('http'):
+        broker = 'https://' + broker
+
+    if kwargs["cert"] is not None:
+        verify = kwargs["cert"]
+    else:
+        verify = kwargs["verify"]
+
+    url = broker + service_route
+    print("Contacting the ansible-service-broker at: %s" % url)
+
+    try:
+        headers = {}
+        if kwargs['basic_auth_username'] is not None and kwargs['basic_auth_password'] is not None:
+            headers = {'Authorization': "Basic " +
+                       base64.b64encode("{0}:{1}".format(kwargs['basic_auth_username'],
+                                                         kwargs['basic_auth_password']))
+                       }
+        elif kwargs['auth_token'] is not None:
+            headers = {'Authorization': "Bearer " + kwargs['auth_token']}
+        else:
+            token = get_cluster_context().api_key()
+            headers = {'Authorization': token}
+        headers.update(kwargs.get("headers") or {})
+        options = dict((name, kwargs[name]) for name in ['retry', 'timeout'] if name in kwargs)
+        response = get_broker_client().request(method, url, verify=verify,
+                                               headers=headers, data=kwargs.get("data"),
+                                               stream=kwargs.get("stream", False), **options)
+    except Exception as e:
+        print("ERROR: Failed broker request (%s) %s" % (method, url))
+        forget_broker_route(broker)
+        raise e
+
+    if response.status_code in RETRY_STATUS_CODES:
+        forget_broker_route(broker)
+
+    return response
+
+
+def forget_broker_route(broker):
+    """ Drop a cached broker route that just failed so the next run rediscovers it """
+    try:
+        invalidate_asb_route(broker)
+    except Exception:
+        # Without a usable kubeconfig nothing can have been cached
+        pass
+
+
+def catalog_cache_key(broker=None):
+    """ Key a catalog by broker URL, or by kubeconfig context for the discovered broker """
+    if broker:
+        if not broker.startswith('http'):
+            broker = 'https://' + broker
+        return broker.rstrip('/')
+    try:
+        return "%s|%s" % (DISCOVERED_BROKER, get_cluster_context().context_name())
+    except Exception:
+        return DISCOVERED_BROKER
+
+
+def forget_catalog(broker=None):
+    """
+    Drop the cached catalog after apb changed what the broker serves. The
+    discovered broker is usually the same one, so its entry goes too.
+    """
+    cache = FileCache(CATALOG_CACHE)
+    for key in set([catalog_cache_key(broker), catalog_cache_key()]):
+        cache.invalidate(key)
+
+
+def bootstrap(broker, username, password, token, verify, cert):
+    client = get_broker_client()
+    response = broker_request(broker, "/v2/bootstrap", "post", data={},
+                              timeout=(client.timeout[0], max(client.timeout[1], BOOTSTRAP_READ_TIMEOUT)),
+                              verify=verify, cert=cert,
+                              basic_auth_username=username,
+                              basic_auth_password=password,
+                              auth_token=token)
+
+    if response.status_code != 200:
+        print("Error: Attempt to bootstrap Broker returned status: %d" % response.status_code)
+        print("Unable to bootstrap Ansible Service Broker.")
+        exit(1)
+
+    forget_catalog(broker)
+    print("Successfully bootstrapped Ansible Service Broker")
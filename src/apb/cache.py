@@ -0,0 +1,76 @@
+""" cache module for small JSON caches kept between apb invocations """
+import os
+import json
+import time
+
+from apb.util import mkdir_p, write_file_atomic
+
+# Overrides the directory the caches are stored in
+CACHE_DIR_ENV = 'APB_CACHE_DIR'
+
+
+def cache_dir():
+    return os.environ.get(CACHE_DIR_ENV) or \
+        os.path.join(os.path.expanduser('~'), '.apb', 'cache')
+
+
+class FileCache(object):
+    """
+    Key/value store backed by one JSON file. Entries older than `ttl` seconds
+    are treated as missing, a `ttl` of None never expires. Writes are
+    atomic, so concurrent apb processes never see a partial file.
+    """
+    def __init__(self, name, ttl=None):
+        self.path = os.path.join(cache_dir(), name + '.json')
+        self.ttl = ttl
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        try:
+            content = json.dumps(entries).encode('utf-8')
+            mkdir_p(os.path.dirname(self.path))
+            write_file_atomic(content, self.path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            # A cache that cannot be written only costs a lookup next time
+            print("Warning: unable to write cache %s: %s" % (self.path, e))
+
+    def entry(self, key):
+        """ Return the raw {'value', 'time'} entry, ignoring the ttl """
+        return self._load().get(key)
+
+    def get(self, key):
+        entry = self.entry(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry['time'] > self.ttl:
+            return None
+        return entry['value']
+
+    def set(self, key, value):
+        entries = self._load()
+        entries[key] = {'value': value, 'time': time.time()}
+        self._save(entries)
+
+    def touch(self, key):
+        """ Restart the ttl of `key`, keeping its value """
+        entries = self._load()
+        if key not in entries:
+            return
+        entries[key]['time'] = time.time()
+        self._save(entries)
+
+    def invalidate(self, key, value=None):
+        """ Drop `key`, or only drop it while it still maps to `value` """
+        entries = self._load()
+        if key not in entries:
+            return
+        if value is not None and entries[key]['value'] != value:
+            return
+        del entries[key]
+        self._save(entries)
@@ -2,9 +2,9 @@
 import os
 import sys
 import argparse
-import pkg_resources
+import importlib
 
-import apb.engine
+from apb.util import set_debug
 
 SKIP_OPTIONS = ['provision', 'deprovision', 'bind', 'unbind', 'roles']
 
@@ -22,10 +22,14 @@ AVAILABLE_COMMANDS = {
     'bootstrap': 'Tell Ansible Service Broker to reload APBs from the container repository',
     'test': 'Test the APB',
     'run': 'Run APB',
-    'version': 'Get current version of APB tool'
-    # 'refresh': 'Refresh all the service-catalog data',
+    'version': 'Get current version of APB tool',
+    'refresh': 'Refresh all the service-catalog data',
+    'validate': 'Validate the spec of every APB under the project path'
 }
 
+# Options of the top level parser that consume the following argument
+GLOBAL_OPTIONS_WITH_VALUE = ['--project', '-p', '--token']
+
 
 def subcmd_list_parser(subcmd):
     """ list subcommand """
@@ -82,6 +86,27 @@ def subcmd_list_parser(subcmd):
         dest='basic_auth_password',
         help=u'Specify the basic auth password to be used'
     )
+    subcmd.add_argument(
+        '--offline',
+        action='store_true',
+        dest='offline',
+        help=u'List the catalog cached by the last apb list without contacting the broker',
+        default=False
+    )
+    subcmd.add_argument(
+        '--no-cache',
+        action='store_true',
+        dest='no_cache',
+        help=u'Download the full catalog even if a cached copy is still valid',
+        default=False
+    )
+    subcmd.add_argument(
+        '--stream',
+        action='store_true',
+        dest='stream',
+        help=u'Print services as they are downloaded (NDJSON with -o json) instead of loading the whole catalog',
+        default=False
+    )
     return
 
 
@@ -102,6 +127,39 @@ def subcmd_build_parser(subcmd):
         help=u'Name of Dockerfile to build with'
     )
 
+    subcmd.add_argument(
+        '--all',
+        action='store_true',
+        dest='all',
+        help=u'Build every APB project (directory with an apb.yml) found under the project path',
+        default=False
+    )
+
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of APBs to build concurrently with --all',
+        default=4
+    )
+
+    subcmd.add_argument(
+        '--force-rebuild',
+        action='store_true',
+        dest='force_rebuild',
+        help=u'Build the image even if an image of the unchanged APB already exists',
+        default=False
+    )
+
+    subcmd.add_argument(
+        '--stats-file',
+        action='store',
+        dest='stats_file',
+        help=u'Write per-step build and per-layer push timings as JSON to this file',
+        default=None
+    )
+
     return
 
 
@@ -281,6 +339,42 @@ def subcmd_push_parser(subcmd):
         help=u'Use Broker development endpoint at /v2/apb/',
         default=False
     )
+    subcmd.add_argument(
+        '--refresh-endpoints',
+        action='store_true',
+        dest='refresh_endpoints',
+        help=u'Rediscover the registry and broker endpoints instead of using the cache',
+        default=False
+    )
+    subcmd.add_argument(
+        '--all',
+        action='store_true',
+        dest='all',
+        help=u'Build and push every APB project found under the project path, then bootstrap once',
+        default=False
+    )
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of APBs to build and push concurrently with --all',
+        default=4
+    )
+    subcmd.add_argument(
+        '--force-rebuild',
+        action='store_true',
+        dest='force_rebuild',
+        help=u'Build the image even if an image of the unchanged APB already exists',
+        default=False
+    )
+    subcmd.add_argument(
+        '--stats-file',
+        action='store',
+        dest='stats_file',
+        help=u'Write per-step build and per-layer push timings as JSON to this file',
+        default=None
+    )
     return
 
 
@@ -356,6 +450,28 @@ def subcmd_remove_parser(subcmd):
         help=u'Name of the ServiceBroker k8s resource',
         default=u'ansible-service-broker'
     )
+    subcmd.add_argument(
+        '--refresh-endpoints',
+        action='store_true',
+        dest='refresh_endpoints',
+        help=u'Rediscover the registry and broker endpoints instead of using the cache',
+        default=False
+    )
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of images to delete concurrently with --local --all',
+        default=4
+    )
+    subcmd.add_argument(
+        '--dry-run',
+        action='store_true',
+        dest='dry_run',
+        help=u'List the images --local --all would delete without deleting them',
+        default=False
+    )
     return
 
 
@@ -455,6 +571,65 @@ def subcmd_test_parser(subcmd):
         help=u'Route of internal OpenShift registry'
     )
 
+    subcmd.add_argument(
+        '--refresh-endpoints',
+        action='store_true',
+        dest='refresh_endpoints',
+        help=u'Rediscover the registry endpoint instead of using the cache',
+        default=False
+    )
+
+    subcmd.add_argument(
+        '--retrieval',
+        action='store',
+        dest='retrieval',
+        help=u'Wait for the test playbook to signal completion, or poll for results',
+        default='signal',
+        choices=['signal', 'poll']
+    )
+
+    subcmd.add_argument(
+        '--timeout',
+        action='store',
+        dest='timeout',
+        type=int,
+        help=u'Seconds to wait for the test results before giving up',
+        default=None
+    )
+
+    subcmd.add_argument(
+        '--all-plans',
+        action='store_true',
+        dest='all_plans',
+        help=u'Run the test action for every plan in the spec, each in its own project',
+        default=False
+    )
+
+    subcmd.add_argument(
+        '--parameter-sets',
+        action='store',
+        dest='parameter_sets',
+        help=u'YAML file with a list of parameter mappings, each one is tested against every selected plan',
+        default=None
+    )
+
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of test runs to execute concurrently',
+        default=4
+    )
+
+    subcmd.add_argument(
+        '--force-rebuild',
+        action='store_true',
+        dest='force_rebuild',
+        help=u'Build the image even if an image of the unchanged APB already exists',
+        default=False
+    )
+
     return
 
 
@@ -510,6 +685,35 @@ def subcmd_run_parser(subcmd):
         help=u'Dockerfile to build internal registry image with',
         default=u'Dockerfile'
     )
+    subcmd.add_argument(
+        '--refresh-endpoints',
+        action='store_true',
+        dest='refresh_endpoints',
+        help=u'Rediscover the registry endpoint instead of using the cache',
+        default=False
+    )
+    subcmd.add_argument(
+        '--timeout',
+        action='store',
+        dest='timeout',
+        type=int,
+        help=u'Seconds to wait for the APB pod to complete before giving up',
+        default=None
+    )
+    subcmd.add_argument(
+        '--log-file',
+        action='store',
+        dest='log_file',
+        help=u'Also append the APB pod log to this file',
+        default=None
+    )
+    subcmd.add_argument(
+        '--force-rebuild',
+        action='store_true',
+        dest='force_rebuild',
+        help=u'Build the image even if an image of the unchanged APB already exists',
+        default=False
+    )
     return
 
 
@@ -562,62 +766,81 @@ def subcmd_relist_parser(subcmd):
     )
     return
 
-# Bug 1585010 - Removing apb refresh as a valid option since it currently depends on kubectl being installed
-# We need to revisit this using the dynamic client as opposed to doing a subprocess call.
-#
-# def subcmd_refresh_parser(subcmd):
-#     """ version subcommand """
-#     subcmd.add_argument(
-#         '--secure',
-#         action='store_true',
-#         dest='verify',
-#         help=u'Verify SSL connection to Ansible Service Broker',
-#         default=False
-#     )
-#     subcmd.add_argument(
-#         '--ca-path',
-#         action='store',
-#         dest='cert',
-#         help=u'CA cert to use for verifying SSL connection to Ansible Service Broker',
-#         default=None
-#     )
-#     subcmd.add_argument(
-#         '--username',
-#         '-u',
-#         action='store',
-#         default=None,
-#         dest='basic_auth_username',
-#         help=u'Specify the basic auth username to be used'
-#     )
-#     subcmd.add_argument(
-#         '--password',
-#         '-p',
-#         action='store',
-#         default=None,
-#         dest='basic_auth_password',
-#         help=u'Specify the basic auth password to be used'
-#     )
-#     subcmd.add_argument(
-#         '--broker',
-#         action='store',
-#         dest='broker',
-#         help=u'Route to the Ansible Service Broker'
-#     )
-#     subcmd.add_argument(
-#         '--no-relist',
-#         action='store_true',
-#         dest='no_relist',
-#         help=u'Do not relist the catalog after pushing an apb to the broker',
-#         default=False
-#     )
-#     subcmd.add_argument(
-#         '--broker-name',
-#         action='store',
-#         dest='broker_name',
-#         help=u'Name of the ServiceBroker k8s resource',
-#         default=u'ansible-service-broker'
-#     )
-#     return
+
+def subcmd_refresh_parser(subcmd):
+    """ refresh subcommand """
+    subcmd.add_argument(
+        '--secure',
+        action='store_true',
+        dest='verify',
+        help=u'Verify SSL connection to Ansible Service Broker',
+        default=False
+    )
+    subcmd.add_argument(
+        '--ca-path',
+        action='store',
+        dest='cert',
+        help=u'CA cert to use for verifying SSL connection to Ansible Service Broker',
+        default=None
+    )
+    subcmd.add_argument(
+        '--username',
+        '-u',
+        action='store',
+        default=None,
+        dest='basic_auth_username',
+        help=u'Specify the basic auth username to be used'
+    )
+    subcmd.add_argument(
+        '--password',
+        '-p',
+        action='store',
+        default=None,
+        dest='basic_auth_password',
+        help=u'Specify the basic auth password to be used'
+    )
+    subcmd.add_argument(
+        '--broker',
+        action='store',
+        dest='broker',
+        help=u'Route to the Ansible Service Broker'
+    )
+    subcmd.add_argument(
+        '--no-relist',
+        action='store_true',
+        dest='no_relist',
+        help=u'Do not relist the catalog after removing the catalog data',
+        default=False
+    )
+    subcmd.add_argument(
+        '--broker-name',
+        action='store',
+        dest='broker_name',
+        help=u'Name of the ServiceBroker k8s resource',
+        default=u'ansible-service-broker'
+    )
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of catalog objects to delete concurrently when a collection delete is not supported',
+        default=8
+    )
+    return
+
+
+def subcmd_validate_parser(subcmd):
+    """ validate subcommand """
+    subcmd.add_argument(
+        '--workers',
+        action='store',
+        dest='workers',
+        type=int,
+        help=u'Number of processes validating specs, defaults to the number of CPUs',
+        default=None
+    )
+    return
 
 
 def subcmd_version_parser(subcmd):
@@ -683,6 +906,25 @@ class OverrideArgumentParser(argparse.ArgumentParser):
         return result
 
 
+def requested_subcommand(argv):
+    """
+    Find the subcommand named in argv without building the full parser, so
+    that only the requested subparser needs to be populated.
+    """
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg in GLOBAL_OPTIONS_WITH_VALUE:
+            skip_next = True
+            continue
+        if arg.startswith('-'):
+            continue
+        return arg if arg in AVAILABLE_COMMANDS else None
+    return None
+
+
 def main():
     """ main """
     # BZ 1581651 - Override the ArgumentParser to disable argument abbreviations.
@@ -720,26 +962,34 @@ def main():
     subparsers = parser.add_subparsers(title='subcommand', dest='subcommand')
     subparsers.required = True
 
+    # Only the requested subcommand gets its arguments, the others are
+    # registered by name so they still show up in the help output.
+    requested = requested_subcommand(sys.argv[1:])
     for subcommand in AVAILABLE_COMMANDS:
         subparser = subparsers.add_parser(
             subcommand, help=AVAILABLE_COMMANDS[subcommand]
         )
-        globals()['subcmd_%s_parser' % subcommand](subparser)
+        if subcommand == requested:
+            globals()['subcmd_%s_parser' % subcommand](subparser)
 
     args = parser.parse_args()
+    set_debug(args.debug)
 
     if args.subcommand == 'help':
         parser.print_help()
         sys.exit(0)
 
     if args.subcommand == 'version':
+        import pkg_resources
         version = pkg_resources.require("apb")[0].version
         print("Version: apb-%s" % version)
         sys.exit(0)
 
     try:
-        getattr(apb.engine,
-                u'cmdrun_{}'.format(args.subcommand))(**vars(args))
+        # Import the subcommand module on demand so local subcommands never
+        # load the cluster and docker client libraries.
+        module = importlib.import_module('apb.commands.%s' % args.subcommand)
+        getattr(module, u'cmdrun_{}'.format(args.subcommand))(**vars(args))
     except Exception as e:
         print("Exception occurred! %s" % e)
         sys.exit(1)
@@ -0,0 +1,974 @@
+""" cluster module with helpers that talk to the OpenShift/Kubernetes API """
+import os
+import sys
+import json
+import codecs
+import time
+import threading
+import subprocess
+import urllib3
+
+from time import sleep
+from multiprocessing.pool import ThreadPool
+from openshift import client as openshift_client, config as openshift_config
+from kubernetes import client as kubernetes_client, config as kubernetes_config, watch as kubernetes_watch
+from kubernetes.client.rest import ApiException
+from kubernetes.stream import stream as kubernetes_stream
+
+from apb.cache import FileCache
+from apb.util import debug
+
+# Disable insecure request warnings from the cluster client
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+WATCH_POD_SLEEP = 5
+# Server side timeout of a single pod watch request, the watch is reopened
+WATCH_TIMEOUT = 5 * 60
+LOG_CHUNK_SIZE = 4096
+LOG_RECONNECTS = 5
+# Printed by ansible-playbook once the test playbook has finished
+TEST_RESULT_SENTINEL = b'PLAY RECAP'
+TEST_RESULT_RETRIES = 5
+
+BROKER_NAMESPACES = ["ansible-service-broker", "openshift-ansible-service-broker",
+                     "openshift-automation-service-broker"]
+BROKER_ROUTE_NAMES = ['asb-1338']
+ROUTE_CACHE_TTL = 60 * 60
+REGISTRY_CACHE_TTL = 60 * 60
+# Images fetched per list request, the image list is paged with limit/continue
+IMAGE_PAGE_SIZE = 500
+IMAGE_DELETE_WORKERS = 4
+CATALOG_GROUP = 'servicecatalog.k8s.io'
+CATALOG_VERSION = 'v1beta1'
+CATALOG_DELETE_WORKERS = 8
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Overrides the size of the HTTP connection pool shared by the API clients
+POOL_SIZE_ENV = 'APB_CLUSTER_POOL_SIZE'
+
+
+class ClusterContext(object):
+    """
+    Loads the kubeconfig once per process and hands out API clients that share
+    a single configuration and connection pool. Safe to use from worker
+    threads. The pool is grown to `workers` connections unless
+    APB_CLUSTER_POOL_SIZE sets its size.
+    """
+    def __init__(self, workers=None):
+        self.pool_size = int(os.environ[POOL_SIZE_ENV]) if os.environ.get(POOL_SIZE_ENV) else None
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._configuration = None
+        self._context_name = None
+        self._clients = {}
+
+    def configuration(self):
+        with self._lock:
+            if self._configuration is None:
+                openshift_config.load_kube_config()
+                configuration = openshift_client.Configuration()
+                if self.pool_size:
+                    configuration.connection_pool_maxsize = self.pool_size
+                elif self.workers:
+                    configuration.connection_pool_maxsize = max(self.workers,
+                                                                configuration.connection_pool_maxsize or 0)
+                self._configuration = configuration
+            return self._configuration
+
+    def _client(self, name, factory):
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = factory(self.configuration())
+            return self._clients[name]
+
+    def core_api(self):
+        return self._client('core', lambda configuration: kubernetes_client.CoreV1Api(
+            kubernetes_client.ApiClient(configuration=configuration)))
+
+    def custom_api(self):
+        return self._client('custom', lambda configuration: kubernetes_client.CustomObjectsApi(
+            kubernetes_client.ApiClient(configuration=configuration)))
+
+    def oapi(self):
+        return self._client('oapi', lambda configuration: openshift_client.OapiApi(
+            openshift_client.ApiClient(configuration=configuration)))
+
+    def context_name(self):
+        with self._lock:
+            if self._context_name is None:
+                _, active_context = kubernetes_config.list_kube_config_contexts()
+                self._context_name = active_context['name']
+            return self._context_name
+
+    def host(self):
+        return self.configuration().host
+
+    def api_key(self):
+        return self.configuration().get_api_key_with_prefix('authorization')
+
+
+_cluster_context = None
+_cluster_context_lock = threading.Lock()
+
+
+def get_cluster_context():
+    global _cluster_context
+    with _cluster_context_lock:
+        if _cluster_context is None:
+            _cluster_context = ClusterContext()
+        return _cluster_context
+
+
+def configure_cluster_context(workers=None):
+    """ Replace the process wide context, called by commands that fan out before their first API call """
+    global _cluster_context
+    with _cluster_context_lock:
+        _cluster_context = ClusterContext(workers)
+        return _cluster_context
+
+
+def get_registry_service_ip(namespace, svc_name):
+    ip = None
+    try:
+        api = get_cluster_context().core_api()
+        service = api.read_namespaced_service(namespace=namespace, name=svc_name)
+        if service is None:
+            print("Couldn't find docker-registry service in namespace default. Erroring.")
+            return None
+        if service.spec.ports == []:
+            print("Service spec appears invalid. Erroring.")
+            return None
+        ip = service.spec.cluster_ip + ":" + str(service.spec.ports[0].port)
+        print("Found registry IP at: " + ip)
+
+    except ApiException as e:
+        print("Exception occurred trying to find %s service in namespace %s: %s" % (svc_name, namespace, e))
+        return None
+    return ip
+
+
+def probe_broker_namespace(namespace):
+    """ Return the broker route host in namespace, or None """
+    oapi = get_cluster_context().oapi()
+    try:
+        # Look up the well known route names first, this avoids listing
+        # every route in the namespace in the common case.
+        for name in BROKER_ROUTE_NAMES:
+            try:
+                return oapi.read_namespaced_route(name, namespace).spec.host
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+
+        for route in oapi.list_namespaced_route(namespace).items:
+            if 'asb' in route.metadata.name and 'etcd' not in route.metadata.name:
+                return route.spec.host
+    except ApiException as e:
+        print("Didn't find OpenShift Automation Broker route in namespace: %s. Reason: [%s]."
+              % (namespace, e.reason))
+    return None
+
+
+def get_asb_route(refresh=False):
+    cache = FileCache('broker-routes', ROUTE_CACHE_TTL)
+    context = get_cluster_context().context_name()
+
+    if not refresh:
+        url = cache.get(context)
+        if url is not None:
+            debug("Using cached broker route for context %s: %s" % (context, url))
+            return url
+
+    # Probe every candidate namespace at once, the first one in the list with
+    # a broker route still wins.
+    pool = ThreadPool(len(BROKER_NAMESPACES))
+    try:
+        hosts = pool.map(probe_broker_namespace, BROKER_NAMESPACES)
+    finally:
+        pool.close()
+
+    for namespace, asb_route in zip(BROKER_NAMESPACES, hosts):
+        if asb_route is None:
+            continue
+        url = asb_route + "/" + namespace
+        if url.find("http") < 0:
+            url = "https://" + url
+        cache.set(context, url)
+        return url
+
+    print("Error finding a route to the OpenShift Automation Broker.")
+    return None
+
+
+def invalidate_asb_route(url):
+    """ Forget the cached broker route if it is still `url` """
+    cache = FileCache('broker-routes', ROUTE_CACHE_TTL)
+    cache.invalidate(get_cluster_context().context_name(), url)
+
+
+def create_project(project):
+    print("Creating project {}".format(project))
+    try:
+        api = get_cluster_context().oapi()
+        api.create_project_request({
+            'apiVersion': 'v1',
+            'kind': 'ProjectRequest',
+            'metadata': {
+                'name': project
+            }
+        })
+        print("Created project")
+
+        # TODO: Evaluate the project request to get the actual project name
+        return project
+    except ApiException as e:
+        if e.status == 409:
+            print("Project {} already exists".format(project))
+            return project
+        else:
+            raise e
+
+
+def delete_project(project):
+    print("Deleting project {}".format(project))
+    try:
+        api = get_cluster_context().oapi()
+        api.delete_project(project)
+        print("Project deleted")
+    except ApiException as e:
+        print("Delete project failure: {}".format(e))
+        raise e
+
+
+def create_service_account(name, namespace):
+    print("Creating service account in {}".format(namespace))
+    try:
+        api = get_cluster_context().core_api()
+        api.create_namespaced_service_account(
+            namespace,
+            {
+                'apiVersion': 'v1',
+                'kind': 'ServiceAccount',
+                'metadata': {
+                    'name': name,
+                    'namespace': namespace,
+                },
+            }
+        )
+        print("Created service account")
+        return name
+    except ApiException as e:
+        if e.status == 409:
+            print("Service account {} already exists".format(name))
+            return name
+        raise e
+
+
+def create_cluster_role_binding(name, user_name, role="cluster-admin"):
+    print("Creating role binding of {} for {}".format(role, user_name))
+    try:
+        api = get_cluster_context().oapi()
+        # TODO: Use generateName when it doesn't throw an exception
+        api.create_cluster_role_binding(
+            {
+                'apiVersion': 'v1',
+                'kind': 'ClusterRoleBinding',
+                'metadata': {
+                    'name': name,
+                },
+                'roleRef': {
+                    'name': role,
+                },
+                'userNames': [user_name]
+            }
+        )
+    except ApiException as e:
+        raise e
+    except Exception as e:
+        # TODO:
+        # Right now you'll see something like --
+        #   Exception occurred! 'module' object has no attribute 'V1RoleBinding'
+        # Looks like an issue with the openshift-restclient...well the version
+        # of k8s included by openshift-restclient. Keeping this from below.
+        pass
+    print("Created Role Binding")
+    return name
+
+
+def create_role_binding(name, namespace, service_account, role="admin"):
+    print("Creating role binding for {} in {}".format(service_account, namespace))
+    try:
+        api = get_cluster_context().oapi()
+        # TODO: Use generateName when it doesn't throw an exception
+        api.create_namespaced_role_binding(
+            namespace,
+            {
+                'apiVersion': 'v1',
+                'kind': 'RoleBinding',
+                'metadata': {
+                    'name': name,
+                    'namespace': namespace,
+                },
+                'subjects': [{
+                    'kind': 'ServiceAccount',
+                    'name': service_account,
+                    'namespace': namespace,
+                }],
+                'roleRef': {
+                    'name': role,
+                },
+            }
+        )
+    except ApiException as e:
+        if e.status == 409:
+            print("Role binding {} already exists".format(name))
+            return name
+        raise e
+    except Exception as e:
+        # TODO:
+        # Right now you'll see something like --
+        #   Exception occurred! 'module' object has no attribute 'V1RoleBinding'
+        # Looks like an issue with the openshift-restclient...well the version
+        # of k8s included by openshift-restclient
+        pass
+    print("Created Role Binding")
+    return name
+
+
+def create_pod(image, name, namespace, command, service_account):
+    print("Creating pod with image {} in {}".format(image, namespace))
+    try:
+        api = get_cluster_context().core_api()
+        pod = api.create_namespaced_pod(
+            namespace,
+            {
+                'apiVersion': 'v1',
+                'kind': 'Pod',
+                'metadata': {
+                    'generateName': name,
+                    'namespace': namespace
+                },
+                'spec': {
+                    'containers': [{
+                        'image': image,
+                        'imagePullPolicy': 'IfNotPresent',
+                        'name': name,
+                        'command': command,
+                        'env': [
+                            {
+                                'name': 'POD_NAME',
+                                'valueFrom': {
+                                    'fieldRef': {'fieldPath': 'metadata.name'}
+                                }
+                            },
+                            {
+                                'name': 'POD_NAMESPACE',
+                                'valueFrom': {
+                                    'fieldRef': {'fieldPath': 'metadata.namespace'}
+                                }
+                            }
+                        ],
+                    }],
+                    'restartPolicy': 'Never',
+                    'serviceAccountName': service_account,
+                }
+            }
+        )
+        print("Created Pod")
+        return (pod.metadata.name, pod.metadata.namespace)
+    except Exception as e:
+        print("failed - %s" % e)
+        return ("", "")
+
+
+def pod_statuses(api, name, namespace, end=None):
+    """
+    Yield the status of the pod every time it changes, using a watch on the
+    pod. If the watch breaks, fall back to polling every WATCH_POD_SLEEP
+    seconds. Stops yielding once `end` (a time.time() value) has passed.
+    """
+    watch = kubernetes_watch.Watch()
+    try:
+        while end is None or time.time() < end:
+            timeout = WATCH_TIMEOUT if end is None else max(1, min(WATCH_TIMEOUT, int(end - time.time())))
+            for event in watch.stream(api.list_namespaced_pod, namespace,
+                                      field_selector='metadata.name={}'.format(name),
+                                      timeout_seconds=timeout):
+                yield event['object'].status
+    except Exception as e:
+        print("Watching pod {} failed, falling back to polling: {}".format(name, e))
+
+    while end is None or time.time() < end:
+        yield api.read_namespaced_pod(name, namespace).status
+        sleep(WATCH_POD_SLEEP)
+
+
+def iter_log_lines(response):
+    """ Split a streamed log response into lines, keeping the newlines """
+    pending = b''
+    for chunk in response.stream(LOG_CHUNK_SIZE):
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def pod_log_lines(api, name, namespace, end=None):
+    """
+    Follow the log of the pod and yield every line as it arrives, until the
+    log ends or the `end` deadline passes. When the stream drops while the
+    pod is still running, it is reopened and the lines that were already
+    yielded are skipped. A last line without a newline is held back until it
+    is completed after a reconnect or the log has ended for good, so it is
+    never shown cut in half.
+    """
+    def expired():
+        return end is not None and time.time() >= end
+
+    lines_yielded = 0
+    reconnects = 0
+    while True:
+        kwargs = {'follow': True, '_preload_content': False}
+        if end is not None:
+            kwargs['_request_timeout'] = max(1, end - time.time())
+        lines_seen = 0
+        partial = None
+        try:
+            response = api.read_namespaced_pod_log(name, namespace, **kwargs)
+            try:
+                for line in iter_log_lines(response):
+                    if not line.endswith(b'\n'):
+                        partial = line
+                    else:
+                        lines_seen += 1
+                        if lines_seen > lines_yielded:
+                            lines_yielded += 1
+                            yield line
+                    # The read timeout only fires on a silent stream
+                    if expired():
+                        break
+            finally:
+                response.release_conn()
+        except Exception as e:
+            if not expired():
+                reconnects += 1
+                if reconnects > LOG_RECONNECTS:
+                    print("Giving up on the log of pod {}: {}".format(name, e))
+                    if partial:
+                        yield partial
+                    return
+                print("Lost the log stream of pod {}, reconnecting: {}".format(name, e))
+        else:
+            # A clean end of stream means the container exited, unless the
+            # connection was closed on us while the pod is still running.
+            if not expired() and api.read_namespaced_pod(name, namespace).status.phase != 'Running':
+                if partial:
+                    yield partial
+                return
+
+        if expired():
+            if partial:
+                yield partial
+            return
+        sleep(WATCH_POD_SLEEP)
+
+
+def follow_pod_log(api, name, namespace, outputs, end=None):
+    """ Write the pod log to `outputs` as it arrives, returns the line count """
+    lines_written = 0
+    for line in pod_log_lines(api, name, namespace, end):
+        for output in outputs:
+            output.write(line)
+            output.flush()
+        lines_written += 1
+    return lines_written
+
+
+def pod_waiting_reason(pod_status):
+    try:
+        return pod_status.container_statuses[0].state.waiting.reason
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def watch_pod(name, namespace, deadline=None, log_file=None):
+    api = get_cluster_context().core_api()
+    end = None if deadline is None else time.time() + deadline
+
+    # Logs are written as raw bytes so they are passed through untouched
+    sys.stdout.flush()
+    outputs = [getattr(sys.stdout, 'buffer', sys.stdout)]
+    if log_file is not None:
+        outputs.append(open(log_file, 'ab'))
+
+    try:
+        last_phase = None
+        log_followed = False
+        for pod_status in pod_statuses(api, name, namespace, end):
+            pod_phase = pod_status.phase
+            if pod_phase != last_phase:
+                print("Pod in phase: {}".format(pod_phase))
+                last_phase = pod_phase
+            if pod_phase in ['Running', 'Succeeded', 'Failed'] and not log_followed:
+                # Blocks until the container exits
+                follow_pod_log(api, name, namespace, outputs, end=end)
+                log_followed = True
+            if pod_phase == 'Succeeded' or pod_phase == 'Failed':
+                return pod_phase
+            if pod_phase == 'Pending':
+                reason = pod_waiting_reason(pod_status)
+                if reason == 'ImagePullBackOff':
+                    raise ApiException("APB failed {} - check name".format(reason))
+    finally:
+        for output in outputs[1:]:
+            output.close()
+
+    raise Exception("Pod {} did not complete within {} seconds".format(name, deadline))
+
+
+def run_apb(project, image, name, action, parameters={}):
+    ns = create_project(project)
+    sa = create_service_account(name, ns)
+    create_role_binding(name, ns, sa)
+
+    parameters['namespace'] = ns
+    command = ['entrypoint.sh', action, "--extra-vars", json.dumps(parameters)]
+
+    return create_pod(
+        image=image,
+        name=name,
+        namespace=ns,
+        command=command,
+        service_account=sa
+    )
+
+
+def exec_test_retrieval(api, name, namespace):
+    """ Run /usr/bin/test-retrieval in the pod, None while results are not ready """
+    api_response = kubernetes_stream(
+        api.connect_get_namespaced_pod_exec,
+        name,
+        namespace,
+        command="/usr/bin/test-retrieval",
+        stderr=True, stdin=False,
+        stdout=True, tty=False)
+    if "test results are not available" in api_response:
+        return None
+    return api_response
+
+
+def termination_message(api, name, namespace):
+    try:
+        pod_status = api.read_namespaced_pod(name, namespace).status
+        return pod_status.container_statuses[0].state.terminated.message
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+def wait_for_test_result(api, name, namespace, end=None, on_line=None):
+    """
+    Wait for the test run to signal completion and fetch the results once.
+
+    The container is watched until it has started, then its log is followed
+    until the playbook prints its recap, at which point the results are
+    retrieved with a single exec. If the container exits first there is no
+    result, its termination message is only printed to help diagnose the
+    crash. Every log line is passed to `on_line` when given.
+    """
+    for pod_status in pod_statuses(api, name, namespace, end):
+        if pod_status.phase != 'Pending':
+            break
+        reason = pod_waiting_reason(pod_status)
+        if reason == 'ImagePullBackOff':
+            print("Test pod failed to start: {}".format(reason))
+            return None
+    else:
+        print("Test pod {} did not start in time".format(name))
+        return None
+
+    for line in pod_log_lines(api, name, namespace, end):
+        if on_line is not None:
+            on_line(line)
+        else:
+            debug(line.rstrip().decode('utf-8', 'replace'))
+        if TEST_RESULT_SENTINEL not in line:
+            continue
+        # The retrieval hook can come up a moment after the recap
+        for attempt in range(TEST_RESULT_RETRIES):
+            result = exec_test_retrieval(api, name, namespace)
+            if result is not None:
+                return result
+            sleep(1)
+        print("Test results were not available after the playbook finished")
+        return None
+
+    print("Pod {} exited without returning test results".format(name))
+    message = termination_message(api, name, namespace)
+    if message:
+        print("Termination message of pod {}:\n{}".format(name, message.rstrip()))
+    return None
+
+
+def poll_test_result(api, name, namespace):
+    count = 0
+    while True:
+        try:
+            count += 1
+            result = exec_test_retrieval(api, name, namespace)
+            if result is not None:
+                return result
+            sleep(WATCH_POD_SLEEP)
+        except ApiException:
+            if count >= 50:
+                return None
+            pod_phase = api.read_namespaced_pod(name, namespace).status.phase
+            if pod_phase == 'Succeeded' or pod_phase == 'Failed':
+                print("Pod phase {} without returning test results".format(pod_phase))
+                return None
+            sleep(WATCH_POD_SLEEP)
+
+
+def retrieve_test_result(name, namespace, mode='signal', deadline=None, on_line=None):
+    try:
+        api = get_cluster_context().core_api()
+    except Exception as e:
+        print("Failed to get api client: {}".format(e))
+        return None
+
+    end = None if deadline is None else time.time() + deadline
+    try:
+        if mode == 'poll':
+            return poll_test_result(api, name, namespace)
+        return wait_for_test_result(api, name, namespace, end, on_line)
+    except Exception as e:
+        print("exception: %s" % e)
+        return None
+
+
+def iter_json_list(response, header, key='items', chunk_size=JSON_CHUNK_SIZE):
+    """
+    Incrementally parse a JSON object response, such as a Kubernetes list,
+    yielding the elements of its `key` array one at a time while the rest of
+    the body is still being read. Every other top level key (kind, metadata,
+    ...) is stored in `header`. Only one element plus one chunk is held in
+    memory at a time. `response` is a urllib3 response that was not
+    preloaded.
+    """
+    decoder = json.JSONDecoder()
+    # Multi-byte characters may be split across chunks
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = response.stream(chunk_size, decode_content=True)
+    state = {'buffer': '', 'pos': 0, 'eof': False}
+
+    def fill():
+        # Drop what has been parsed, then append the next chunk
+        state['buffer'] = state['buffer'][state['pos']:]
+        state['pos'] = 0
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            state['eof'] = True
+            state['buffer'] += text.decode(b'', final=True)
+            return False
+        state['buffer'] += text.decode(chunk)
+        return True
+
+    def skip_to():
+        # Skip whitespace and return the next significant character
+        while True:
+            buf = state['buffer']
+            while state['pos'] < len(buf) and buf[state['pos']] in ' \t\r\n':
+                state['pos'] += 1
+            if state['pos'] < len(buf):
+                return buf[state['pos']]
+            if not fill():
+                raise ValueError("Unexpected end of JSON list response")
+
+    def expect(chars):
+        char = skip_to()
+        if char not in chars:
+            raise ValueError("Expected one of %r in JSON list response, found %r" % (chars, char))
+        state['pos'] += 1
+        return char
+
+    def value():
+        skip_to()
+        while True:
+            try:
+                buf = state['buffer']
+                result, end = decoder.raw_decode(buf, state['pos'])
+                # Strings, objects and arrays end with their closing character.
+                # A number cut at the chunk boundary still decodes, 1.|5 or
+                # 1e|10 as 1, so it is complete only once a delimiter follows.
+                if buf[state['pos']] in '"{[' or state['eof'] or \
+                        (end < len(buf) and buf[end] in ' \t\r\n,:]}'):
+                    state['pos'] = end
+                    return result
+            except ValueError:
+                if state['eof']:
+                    raise
+            fill()
+
+    expect('{')
+    if skip_to() == '}':
+        return
+    while True:
+        name = value()
+        expect(':')
+        if name == key and skip_to() == '[':
+            state['pos'] += 1
+            if skip_to() == ']':
+                state['pos'] += 1
+            else:
+                while True:
+                    yield value()
+                    if expect(',]') == ']':
+                        break
+        else:
+            header[name] = value()
+        if expect(',}') == '}':
+            return
+
+
+def iter_registry_images(page_size=IMAGE_PAGE_SIZE):
+    """ Yield every image known to the cluster, one page of the list at a time """
+    oapi = get_cluster_context().oapi()
+    token = None
+    while True:
+        kwargs = {'limit': page_size, '_preload_content': False}
+        if token:
+            kwargs['_continue'] = token
+        response = oapi.list_image(**kwargs)
+        header = {}
+        try:
+            for image in iter_json_list(response, header):
+                yield image
+        finally:
+            response.release_conn()
+        token = (header.get('metadata') or {}).get('continue')
+        if not token:
+            return
+
+
+def get_registry_images():
+    try:
+        image_list = {'items': list(iter_registry_images())}
+    except Exception as e:
+        print("Exception retrieving list of images: %s" % e)
+        raise Exception("Unable to retrieve images in local registry")
+    return image_list
+
+
+def image_repository(image_fqn):
+    """ Strip the registry from an image reference, registry/namespace/name -> namespace/name """
+    return image_fqn.split('/', 1)[-1]
+
+
+class RegistryImageIndex(object):
+    """
+    Index of the cluster's images by repository (namespace/name without the
+    registry), mapping to the (image_fqn, digest) pairs found for it. Built
+    from one pass over the paged image list and reused for every lookup
+    made while the command runs.
+    """
+    def __init__(self, images):
+        self._lock = threading.Lock()
+        self._repositories = {}
+        for image in images:
+            image_fqn, image_sha = image['dockerImageReference'].split("@")
+            self._repositories.setdefault(image_repository(image_fqn), []).append((image_fqn, image_sha))
+
+    def repositories(self):
+        with self._lock:
+            return sorted(self._repositories)
+
+    def lookup(self, repository):
+        with self._lock:
+            return list(self._repositories.get(repository, []))
+
+    def forget(self, repository, image_sha):
+        with self._lock:
+            remaining = [entry for entry in self._repositories.get(repository, []) if entry[1] != image_sha]
+            if remaining:
+                self._repositories[repository] = remaining
+            else:
+                self._repositories.pop(repository, None)
+
+
+_registry_image_index = None
+_registry_image_index_lock = threading.Lock()
+
+
+def get_registry_image_index(refresh=False):
+    global _registry_image_index
+    with _registry_image_index_lock:
+        if _registry_image_index is None or refresh:
+            try:
+                _registry_image_index = RegistryImageIndex(iter_registry_images())
+            except Exception as e:
+                print("Exception retrieving list of images: %s" % e)
+                raise Exception("Unable to retrieve images in local registry")
+        return _registry_image_index
+
+
+def get_registry(kwargs):
+    namespace = kwargs['reg_namespace']
+    service = kwargs['reg_svc_name']
+    registry_route = kwargs['reg_route']
+
+    if registry_route:
+        return registry_route
+
+    # Discovery costs an API round trip or a minishift subprocess, so the
+    # result is remembered per kubeconfig context unless asked to refresh.
+    cache = FileCache('registries', REGISTRY_CACHE_TTL)
+    if is_minishift():
+        key = "%s|minishift" % get_cluster_context().context_name()
+    else:
+        key = "%s|%s/%s" % (get_cluster_context().context_name(), namespace, service)
+
+    if not kwargs.get('refresh_endpoints'):
+        registry = cache.get(key)
+        if registry is not None:
+            debug("Using cached registry for %s: %s" % (key, registry))
+            return registry
+
+    if is_minishift():
+        registry = get_minishift_registry()
+    else:
+        registry = get_registry_service_ip(namespace, service)
+        if registry is None:
+            print("Failed to find registry service IP address.")
+            raise Exception("Unable to get registry IP from namespace %s" % namespace)
+
+    cache.set(key, registry)
+    return registry
+
+
+def delete_old_images(image_name):
+    # Let's ignore the registry prefix for now because sometimes our tag doesn't match the registry
+    registry, image_name = image_name.split('/', 1)
+    try:
+        oapi = get_cluster_context().oapi()
+        index = get_registry_image_index()
+        for image_fqn, image_sha in index.lookup(image_name):
+            print("Found image: %s" % image_fqn)
+            if registry not in image_fqn:
+                # This warning will only get displayed if a user has used --registry-route
+                # This is because the route name gets collapsed into the service hostname
+                # when pushed to the registry.
+                print("Warning: Tagged image registry prefix doesn't match. Deleting anyway. Given: %s; Found: %s"
+                      % (registry, image_fqn.split('/')[0]))
+            oapi.delete_image(name=image_sha, body={})
+            index.forget(image_name, image_sha)
+            print("Successfully deleted %s" % image_sha)
+
+    except Exception as e:
+        print("Exception deleting old images: %s" % e)
+        print("Not erroring out, this may cause duplicate images in the registry. Try: `oc get images`.")
+    return
+
+
+def delete_registry_images(digests, workers=IMAGE_DELETE_WORKERS, dry_run=False):
+    """
+    Delete image digests from the cluster on a pool of at most `workers`
+    threads sharing one API client, printing progress as each one finishes.
+    Duplicate digests are deleted once. Returns a dict of the digests that
+    could not be deleted, mapped to their error.
+    """
+    digests = sorted(set(digests))
+    if dry_run:
+        for digest in digests:
+            print("Would delete %s" % digest)
+        return {}
+
+    oapi = get_cluster_context().oapi()
+    lock = threading.Lock()
+    progress = {'done': 0}
+    failures = {}
+
+    def delete(digest):
+        error = None
+        try:
+            oapi.delete_image(name=digest, body={})
+        except ApiException as e:
+            # Already gone is as good as deleted
+            if e.status != 404:
+                error = "%s %s" % (e.status, e.reason)
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        with lock:
+            progress['done'] += 1
+            if error is None:
+                print("[%d/%d] Deleted %s" % (progress['done'], len(digests), digest))
+            else:
+                failures[digest] = error
+                print("[%d/%d] Failed to delete %s: %s" % (progress['done'], len(digests), digest, error))
+
+    pool = ThreadPool(max(1, min(workers, len(digests))))
+    try:
+        pool.map(delete, digests)
+    finally:
+        pool.close()
+    return failures
+
+
+def delete_catalog_resources(plural, workers=CATALOG_DELETE_WORKERS):
+    """
+    Delete every cluster scoped service catalog resource of a kind, e.g.
+    clusterserviceclasses. A single collection delete is tried first; when
+    the client or the server does not support it, the objects are listed
+    once and deleted on a pool of at most `workers` threads. Returns the
+    number of objects deleted.
+    """
+    api = get_cluster_context().custom_api()
+    objects = api.list_cluster_custom_object(CATALOG_GROUP, CATALOG_VERSION, plural)
+    names = [item['metadata']['name'] for item in objects.get('items', [])]
+    if not names:
+        return 0
+
+    try:
+        api.delete_collection_cluster_custom_object(CATALOG_GROUP, CATALOG_VERSION, plural)
+        debug("Deleted %d %s with a collection delete" % (len(names), plural))
+        return len(names)
+    except AttributeError:
+        debug("Client has no collection delete, deleting %s one at a time" % plural)
+    except ApiException as e:
+        if e.status not in (404, 405):
+            raise
+        debug("Server refused the collection delete of %s (%s)" % (plural, e.status))
+
+    def delete(name):
+        try:
+            api.delete_cluster_custom_object(CATALOG_GROUP, CATALOG_VERSION, plural, name,
+                                             body=kubernetes_client.V1DeleteOptions())
+        except ApiException as e:
+            # Deleted by the broker or someone else in the meantime
+            if e.status != 404:
+                raise
+        print("Deleted %s/%s" % (plural, name))
+
+    pool = ThreadPool(max(1, min(workers, len(names))))
+    try:
+        pool.map(delete, names)
+    finally:
+        pool.close()
+    return len(names)
+
+
+def is_minishift():
+    # Assume user is using minishift if the shell has been configured to use
+    # a minishift docker daemon.
+    docker_cert_path = os.environ.get('DOCKER_CERT_PATH')
+    if docker_cert_path is None:
+        return False
+    return "minishift" in docker_cert_path
+
+
+def get_minishift_registry():
+    cmd = "minishift openshift registry"
+    return os.environ.get('MINISHIFT_REGISTRY') or \
+        subprocess.check_output(cmd, stderr=subprocess.STDOUT, shell=True).decode('utf-8').strip()
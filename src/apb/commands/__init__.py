@@ -0,0 +1 @@
+""" commands package, one module per apb subcommand """
@@ -0,0 +1,11 @@
+""" bootstrap subcommand """
+from apb.broker import bootstrap, relist_service_broker
+
+
+def cmdrun_bootstrap(**kwargs):
+    bootstrap(kwargs["broker"], kwargs.get("basic_auth_username"),
+              kwargs.get("basic_auth_password"), kwargs.get("auth_token"),
+              kwargs["verify"], kwargs["cert"])
+
+    if not kwargs['no_relist']:
+        relist_service_broker(kwargs)
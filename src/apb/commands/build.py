@@ -0,0 +1,41 @@
+""" build subcommand """
+from apb.image import build_apb, build_projects, print_build_summary, write_stats
+from apb.spec import find_apb_projects
+
+
+def cmdrun_build(**kwargs):
+    project = kwargs['base_path']
+    if kwargs.get('all'):
+        build_all(project, **kwargs)
+        return
+
+    stats = {}
+    build_apb(
+        project,
+        kwargs['dockerfile'],
+        kwargs['tag'],
+        force=kwargs.get('force_rebuild', False),
+        stats=stats
+    )
+    if kwargs.get('stats_file'):
+        write_stats(kwargs['stats_file'], stats)
+
+
+def build_all(root, **kwargs):
+    if kwargs['tag']:
+        raise Exception("--tag cannot be used with --all, images are tagged with their spec name")
+
+    projects = find_apb_projects(root)
+    if not projects:
+        print("No APB projects found under %s" % root)
+        exit(1)
+
+    print("Building %d APB projects found under %s" % (len(projects), root))
+    results = build_projects(projects, kwargs['dockerfile'], workers=kwargs['workers'],
+                             force=kwargs.get('force_rebuild', False))
+    print_build_summary(results)
+    if kwargs.get('stats_file'):
+        write_stats(kwargs['stats_file'], results)
+
+    if any(result['error'] is not None for result in results):
+        exit(1)
@@ -0,0 +1,183 @@
+""" init subcommand """
+import os
+import shutil
+import string
+
+from jinja2 import Environment, FileSystemLoader
+
+from apb.spec import DOCKERFILE, SPEC_FILE, load_dockerfile
+from apb.util import mkdir_p, write_file
+
+DAT_DIR = 'dat'
+DAT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), DAT_DIR)
+
+EX_SPEC_FILE = 'apb.yml.j2'
+EX_SPEC_FILE_PATH = os.path.join(DAT_PATH, EX_SPEC_FILE)
+
+EX_DOCKERFILE = 'Dockerfile.j2'
+EX_DOCKERFILE_PATH = os.path.join(DAT_PATH, EX_DOCKERFILE)
+
+MAKEFILE = 'Makefile'
+EX_MAKEFILE = 'Makefile.j2'
+EX_MAKEFILE_PATH = os.path.join(DAT_PATH, EX_MAKEFILE)
+
+ACTION_TEMPLATE_DICT = {
+    'provision': {
+        'playbook_template': 'playbooks/playbook.yml.j2',
+        'playbook_dir': 'playbooks',
+        'playbook_file': 'provision.yml',
+        'role_task_main_template': 'roles/provision/tasks/main.yml.j2',
+        'role_tasks_dir': 'roles/$role_name/tasks',
+        'role_task_main_file': 'main.yml'
+    },
+    'deprovision': {
+        'playbook_template': 'playbooks/playbook.yml.j2',
+        'playbook_dir': 'playbooks',
+        'playbook_file': 'deprovision.yml',
+        'role_task_main_template': 'roles/deprovision/tasks/main.yml.j2',
+        'role_tasks_dir': 'roles/$role_name/tasks',
+        'role_task_main_file': 'main.yml'
+    },
+    'bind': {
+        'playbook_template': 'playbooks/playbook.yml.j2',
+        'playbook_dir': 'playbooks',
+        'playbook_file': 'bind.yml',
+        'role_task_main_template': 'roles/bind/tasks/main.yml.j2',
+        'role_tasks_dir': 'roles/$role_name/tasks',
+        'role_task_main_file': 'main.yml'
+    },
+    'unbind': {
+        'playbook_template': 'playbooks/playbook.yml.j2',
+        'playbook_dir': 'playbooks',
+        'playbook_file': 'unbind.yml',
+        'role_task_main_template': 'roles/unbind/tasks/main.yml.j2',
+        'role_tasks_dir': 'roles/$role_name/tasks',
+        'role_task_main_file': 'main.yml'
+    },
+}
+
+SKIP_OPTIONS = ['provision', 'deprovision', 'bind', 'unbind', 'roles']
+
+
+def load_makefile(apb_dict, params):
+    env = Environment(loader=FileSystemLoader(DAT_PATH), trim_blocks=True)
+    template = env.get_template(EX_MAKEFILE)
+
+    if not params:
+        params = []
+
+    return template.render(apb_dict=apb_dict, params=params)
+
+
+def load_example_specfile(apb_dict, params):
+    env = Environment(loader=FileSystemLoader(DAT_PATH), trim_blocks=True)
+    template = env.get_template(EX_SPEC_FILE)
+
+    if not params:
+        params = []
+
+    return template.render(apb_dict=apb_dict, params=params)
+
+
+def write_playbook(project_dir, apb_dict, action):
+    env = Environment(loader=FileSystemLoader(DAT_PATH))
+    templates = ACTION_TEMPLATE_DICT[action]
+    playbook_template = env.get_template(templates['playbook_template'])
+    playbook_out = playbook_template.render(apb_dict=apb_dict, action_name=action)
+
+    playbook_pathname = os.path.join(project_dir,
+                                     templates['playbook_dir'],
+                                     templates['playbook_file'])
+    mkdir_p(os.path.join(project_dir, templates['playbook_dir']))
+    write_file(playbook_out, playbook_pathname, True)
+
+
+def write_role(project_path, apb_dict, action):
+    env = Environment(loader=FileSystemLoader(DAT_PATH))
+    templates = ACTION_TEMPLATE_DICT[action]
+    template = env.get_template(templates['role_task_main_template'])
+    main_out = template.render(apb_dict=apb_dict, action_name=action)
+
+    role_name = action + '-' + apb_dict['name']
+    dir_tpl = string.Template(templates['role_tasks_dir'])
+    dir = dir_tpl.substitute(role_name=role_name)
+    role_tasks_dir = os.path.join(project_path, dir)
+
+    mkdir_p(role_tasks_dir)
+    main_filepath = os.path.join(role_tasks_dir, templates['role_task_main_file'])
+    write_file(main_out, main_filepath, True)
+
+
+def generate_playbook_files(project_path, skip, apb_dict):
+    print("Generating playbook files")
+
+    for action in ACTION_TEMPLATE_DICT.keys():
+        if not skip[action]:
+            write_playbook(project_path, apb_dict, action)
+            if not skip['roles']:
+                write_role(project_path, apb_dict, action)
+
+
+def cmdrun_init(**kwargs):
+    current_path = kwargs['base_path']
+    bindable = kwargs['bindable']
+    async_opt = kwargs['async']
+    dockerhost = kwargs['dockerhost']
+    skip = {
+        'provision': kwargs['skip-provision'],
+        'deprovision': kwargs['skip-deprovision'],
+        'bind': kwargs['skip-bind'] or not kwargs['bindable'],
+        'unbind': kwargs['skip-unbind'] or not kwargs['bindable'],
+        'roles': kwargs['skip-roles']
+    }
+    if kwargs['tag'].endswith("/"):
+        kwargs['tag'] = kwargs['tag'][:-1]
+
+    apb_tag_arr = kwargs['tag'].split('/')
+    apb_name = apb_tag_arr[-1]
+    app_org = apb_tag_arr[0]
+    if apb_name.lower().endswith("-apb"):
+        app_name = apb_name[:-4]
+    else:
+        app_name = apb_name
+
+    description = "This is a sample application generated by apb init"
+
+    apb_dict = {
+        'name': apb_name,
+        'app_name': app_name,
+        'app_org': app_org,
+        'description': description,
+        'bindable': bindable,
+        'async': async_opt,
+        'dockerhost': dockerhost,
+        'dependencies': kwargs['dependencies']
+    }
+
+    project = os.path.join(current_path, apb_name)
+
+    if os.path.exists(project):
+        if not kwargs['force']:
+            raise Exception('ERROR: Project directory: [%s] found and force option not specified' % project)
+        shutil.rmtree(project)
+
+    print("Initializing %s for an APB." % project)
+
+    os.mkdir(project)
+
+    spec_path = os.path.join(project, SPEC_FILE)
+    dockerfile_path = os.path.join(os.path.join(project, DOCKERFILE))
+    makefile_path = os.path.join(os.path.join(project, MAKEFILE))
+
+    specfile_out = load_example_specfile(apb_dict, [])
+    write_file(specfile_out, spec_path, kwargs['force'])
+
+    dockerfile_out = load_dockerfile(EX_DOCKERFILE_PATH)
+    write_file(dockerfile_out, dockerfile_path, kwargs['force'])
+
+    makefile_out = load_makefile(apb_dict, [])
+    write_file(makefile_out, makefile_path, kwargs['force'])
+
+    generate_playbook_files(project, skip, apb_dict)
+    print("Successfully initialized project directory at: %s" % project)
+    print("Please run *apb prepare* inside of this directory after editing files.")
@@ -0,0 +1,220 @@
+""" list subcommand """
+import sys
+import json
+import time
+
+from collections import OrderedDict
+from ruamel.yaml import YAML
+from ruamel.yaml.representer import SafeRepresenter
+
+from apb.broker import CATALOG_CACHE, broker_request, catalog_cache_key
+from apb.cache import FileCache
+from apb.cluster import iter_json_list
+
+# Catalogs of brokers that send neither an ETag nor a Last-Modified header are
+# reused for this many seconds without contacting the broker
+CATALOG_CACHE_TTL = 5 * 60
+# Column widths of the table printed with --stream, service ids are md5 sums
+STREAM_ID_WIDTH = 34
+STREAM_NAME_WIDTH = 40
+
+
+def cmdrun_list(**kwargs):
+    if kwargs.get('stream'):
+        stream_catalog(**kwargs)
+        return
+
+    services = fetch_catalog(**kwargs)
+
+    if not services:
+        print("No APBs found")
+    elif kwargs["output"] == 'json':
+        print_json_list(services)
+    elif kwargs["verbose"]:
+        print_verbose_list(services)
+    else:
+        print_list(services)
+
+
+def fetch_catalog(**kwargs):
+    """
+    Return the services of the broker catalog. The catalog is cached on disk
+    per broker and revalidated with If-None-Match/If-Modified-Since when the
+    broker sent validators, otherwise it is reused until CATALOG_CACHE_TTL
+    runs out. With `offline` only the cache is read.
+    """
+    cache = FileCache(CATALOG_CACHE)
+    key = catalog_cache_key(kwargs['broker'])
+    entry = None if kwargs.get('no_cache') else cache.entry(key)
+
+    if kwargs.get('offline'):
+        if entry is None:
+            print("No cached catalog for %s, run `apb list` while online first." % key)
+            exit(1)
+        return entry['value']['services']
+
+    headers = {}
+    if entry is not None:
+        cached = entry['value']
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        if not headers and time.time() - entry['time'] < CATALOG_CACHE_TTL:
+            return cached['services']
+
+    response = broker_request(kwargs['broker'], "/v2/catalog", "get",
+                              verify=kwargs["verify"], cert=kwargs["cert"],
+                              basic_auth_username=kwargs.get("basic_auth_username"),
+                              basic_auth_password=kwargs.get("basic_auth_password"),
+                              auth_token=kwargs.get("auth_token"),
+                              headers=headers)
+
+    if response.status_code == 304 and entry is not None:
+        cache.touch(key)
+        return entry['value']['services']
+
+    if response.status_code != 200:
+        print("Error: Attempt to list APBs in the broker returned status: %d" % response.status_code)
+        print("Unable to list APBs in Ansible Service Broker.")
+        exit(1)
+
+    services = response.json()['services']
+    cache.set(key, {
+        'services': services,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+    return services
+
+
+def stream_catalog(**kwargs):
+    """
+    Print the catalog service by service while it is being downloaded, as
+    NDJSON with --output json, YAML documents with --verbose or unsorted
+    table rows otherwise. Only one service is held in memory at a time, the
+    catalog cache is neither read nor written.
+    """
+    response = broker_request(kwargs['broker'], "/v2/catalog", "get",
+                              verify=kwargs["verify"], cert=kwargs["cert"],
+                              basic_auth_username=kwargs.get("basic_auth_username"),
+                              basic_auth_password=kwargs.get("basic_auth_password"),
+                              auth_token=kwargs.get("auth_token"),
+                              stream=True)
+
+    try:
+        if response.status_code != 200:
+            print("Error: Attempt to list APBs in the broker returned status: %d" % response.status_code)
+            print("Unable to list APBs in Ansible Service Broker.")
+            exit(1)
+
+        template = "{id:%d}{name:%d}{description}" % (STREAM_ID_WIDTH, STREAM_NAME_WIDTH)
+        dumper = verbose_dumper()
+        count = 0
+        for service in iter_json_list(response.raw, {}, 'services'):
+            if kwargs["output"] == 'json':
+                print(json.dumps(service, sort_keys=True))
+            elif kwargs["verbose"]:
+                print_service(service, dumper)
+            else:
+                if count == 0:
+                    print(template.format(id="ID", name="NAME", description="DESCRIPTION"))
+                print(template.format(**service))
+            sys.stdout.flush()
+            count += 1
+    finally:
+        response.close()
+
+    if count == 0 and kwargs["output"] != 'json':
+        print("No APBs found")
+
+
+def print_json_list(services):
+    print(json.dumps(services, indent=4, sort_keys=True))
+
+
+class OrderedSafeRepresenter(SafeRepresenter):
+    """ Safe representer that keeps the order of mappings instead of sorting them """
+    def __init__(self, *args, **kwargs):
+        SafeRepresenter.__init__(self, *args, **kwargs)
+        self.sort_base_mapping_type_on_output = False
+
+
+OrderedSafeRepresenter.add_representer(OrderedDict, SafeRepresenter.represent_dict)
+
+
+def verbose_dumper():
+    """
+    YAML dumper for verbose listings. The safe dumper uses the libyaml C
+    emitter when it is installed, the output needs no comments or other
+    round-trip metadata. Each service is its own document.
+    """
+    dumper = YAML(typ='safe')
+    dumper.Representer = OrderedSafeRepresenter
+    dumper.default_flow_style = False
+    dumper.explicit_start = True
+    return dumper
+
+
+def print_verbose_list(services):
+    verbose_dumper().dump_all([service_document(service) for service in services], sys.stdout)
+
+
+def print_service(service, dumper=None):
+    if dumper is None:
+        dumper = verbose_dumper()
+    dumper.dump(service_document(service), sys.stdout)
+
+
+def service_document(service):
+    document = OrderedDict()
+    for key in ['name', 'id', 'description', 'bindable', 'metadata']:
+        if key in service:
+            document[key] = service[key]
+    if 'plans' in service:
+        document['plans'] = pretty_plans(service['plans'])
+    return document
+
+
+def pretty_plans(plans):
+    pp = []
+    if plans is None:
+        return
+    for plan in plans:
+        document = OrderedDict()
+        for key in ['name', 'description', 'free', 'metadata']:
+            if key in plan:
+                document[key] = plan[key]
+
+        try:
+            plan_params = plan['schemas']['service_instance']['create']['parameters']['properties']
+        except KeyError:
+            plan_params = []
+
+        document['parameters'] = plan_params
+
+        try:
+            plan_bind_params = plan['schemas']['service_binding']['create']['parameters']['properties']
+        except KeyError:
+            plan_bind_params = []
+
+        document['bind_parameters'] = plan_bind_params
+
+        pp.append(document)
+    return pp
+
+
+def print_list(services):
+    max_id = 10
+    max_name = 10
+    max_desc = 10
+
+    for service in services:
+        max_id = max(max_id, len(service["id"]))
+        max_name = max(max_name, len(service["name"]))
+        max_desc = max(max_desc, len(service["description"]))
+
+    template = "{id:%d}{name:%d}{description:%d}" % (max_id + 2, max_name + 2, max_desc + 2)
+    print(template.format(id="ID", name="NAME", description="DESCRIPTION"))
+    for service in sorted(services, key=lambda s: s['name']):
+        print(template.format(**service))
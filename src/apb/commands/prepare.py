@@ -0,0 +1,16 @@
+""" prepare subcommand """
+from apb.spec import DOCKERFILE, get_project, is_valid_spec, update_dockerfile
+
+
+def cmdrun_prepare(**kwargs):
+    project = get_project(kwargs['base_path'])
+    dockerfile = DOCKERFILE
+
+    if kwargs['dockerfile']:
+        dockerfile = kwargs['dockerfile']
+
+    if not is_valid_spec(project.spec()):
+        print("Error! Spec failed validation check. Not updating Dockerfile.")
+        exit(1)
+
+    update_dockerfile(project, dockerfile)
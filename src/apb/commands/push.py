@@ -0,0 +1,106 @@
+""" push subcommand """
+import base64
+
+from apb.broker import bootstrap, broker_request, forget_catalog, relist_service_broker
+from apb.cluster import configure_cluster_context, get_asb_route, get_registry
+from apb.image import build_apb, build_projects, print_build_summary, push_apb, write_stats
+from apb.spec import find_apb_projects, get_project
+
+
+def cmdrun_push(**kwargs):
+    project = kwargs['base_path']
+    if kwargs.get('all'):
+        push_all(project, **kwargs)
+        return
+
+    project = get_project(project)
+    spec = project.spec_str()
+    dict_spec = project.spec()
+    blob = base64.b64encode(project.spec_bytes())
+    data_spec = {'apbSpec': blob}
+    broker = kwargs["broker"]
+    if broker is None:
+        broker = get_asb_route(refresh=kwargs.get('refresh_endpoints', False))
+    print(spec)
+    if kwargs['broker_push']:
+        response = broker_request(broker, "/v2/apb", "post", data=data_spec,
+                                  verify=kwargs["verify"], cert=kwargs["cert"],
+                                  basic_auth_username=kwargs.get("basic_auth_username"),
+                                  basic_auth_password=kwargs.get("basic_auth_password"),
+                                  auth_token=kwargs.get("auth_token"))
+
+        if response.status_code != 200:
+            print("Error: Attempt to add APB to the Broker returned status: %d" % response.status_code)
+            print("Unable to add APB to Ansible Service Broker.")
+            exit(1)
+
+        forget_catalog(broker)
+        print("Successfully added APB to Ansible Service Broker")
+        return
+
+    registry = get_registry(kwargs)
+    tag = registry + "/" + kwargs['namespace'] + "/" + dict_spec['name']
+
+    stats = {}
+    build_apb(project, kwargs['dockerfile'], tag, force=kwargs.get('force_rebuild', False), stats=stats)
+    push_apb(registry, tag, stats, **kwargs)
+    if kwargs.get('stats_file'):
+        write_stats(kwargs['stats_file'], stats)
+    bootstrap(
+        broker,
+        kwargs.get("basic_auth_username"),
+        kwargs.get("basic_auth_password"),
+        kwargs.get("auth_token"),
+        kwargs["verify"], kwargs["cert"]
+    )
+
+    if not kwargs['no_relist']:
+        relist_service_broker(kwargs)
+
+
+def push_all(root, **kwargs):
+    """
+    Build and push every APB under root concurrently, then bootstrap the
+    broker and relist the catalog once for the whole batch.
+    """
+    if kwargs['broker_push']:
+        raise Exception("--push-to-broker cannot be used with --all")
+
+    projects = find_apb_projects(root)
+    if not projects:
+        print("No APB projects found under %s" % root)
+        exit(1)
+
+    configure_cluster_context(kwargs['workers'])
+    broker = kwargs["broker"]
+    if broker is None:
+        broker = get_asb_route(refresh=kwargs.get('refresh_endpoints', False))
+    registry = get_registry(kwargs)
+    tag_prefix = registry + "/" + kwargs['namespace'] + "/"
+
+    print("Building and pushing %d APB projects found under %s" % (len(projects), root))
+    results = build_projects(projects, kwargs['dockerfile'], tag_prefix, kwargs['workers'],
+                             registry=registry, auth_token=kwargs['auth_token'],
+                             force=kwargs.get('force_rebuild', False))
+    print_build_summary(results)
+    if kwargs.get('stats_file'):
+        write_stats(kwargs['stats_file'], results)
+
+    failed = [result for result in results if result['error'] is not None]
+    if len(failed) == len(results):
+        print("No APB was pushed, not bootstrapping the broker.")
+        exit(1)
+
+    bootstrap(
+        broker,
+        kwargs.get("basic_auth_username"),
+        kwargs.get("basic_auth_password"),
+        kwargs.get("auth_token"),
+        kwargs["verify"], kwargs["cert"]
+    )
+
+    if not kwargs['no_relist']:
+        relist_service_broker(kwargs)
+
+    if failed:
+        exit(1)
@@ -0,0 +1,20 @@
+""" refresh subcommand """
+from apb.broker import forget_catalog, relist_service_broker
+from apb.cluster import configure_cluster_context, delete_catalog_resources
+
+
+def cmdrun_refresh(**kwargs):
+    configure_cluster_context(kwargs.get('workers'))
+    for plural in ['clusterserviceclasses', 'clusterserviceplans']:
+        print("Deleting %s" % plural)
+        deleted = delete_catalog_resources(plural, kwargs.get('workers') or 1)
+        if deleted == 0:
+            print("No resources found.")
+            print("Run `apb relist` to populate the catalog with %s" % plural)
+        else:
+            print("Deleted %d %s" % (deleted, plural))
+
+    forget_catalog()
+    print("Catalog data has been removed. Relisting data..")
+    if not kwargs['no_relist']:
+        relist_service_broker(kwargs)
@@ -0,0 +1,6 @@
+""" relist subcommand """
+from apb.broker import relist_service_broker
+
+
+def cmdrun_relist(**kwargs):
+    relist_service_broker(kwargs)
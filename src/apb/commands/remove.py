@@ -0,0 +1,110 @@
+""" remove subcommand """
+from apb.broker import bootstrap, broker_request, forget_catalog, relist_service_broker
+from apb.cluster import (configure_cluster_context, delete_old_images, delete_registry_images, get_asb_route,
+                         get_registry, get_registry_image_index)
+from apb.spec import get_spec
+
+
+def cmdrun_remove(**kwargs):
+    images = []
+    if kwargs['broker'] is None and kwargs.get('refresh_endpoints'):
+        kwargs['broker'] = get_asb_route(refresh=True)
+    if kwargs["all"] and not kwargs["local"]:
+        route = "/v2/apb"
+        old_route = "/apb/spec"
+    elif kwargs["id"] is not None:
+        route = "/v2/apb/" + kwargs["id"]
+        old_route = "/apb/spec/" + kwargs["id"]
+    elif kwargs["local"] is True and kwargs["all"]:
+        remove_all_local(**kwargs)
+        return
+    elif kwargs["local"] is True:
+        print("Attempting to delete associated registry image.")
+        project = kwargs['base_path']
+        spec = get_spec(project, 'dict')
+        kwargs['reg_namespace'] = "default"
+        kwargs['reg_svc_name'] = "docker-registry"
+        kwargs['reg_route'] = None
+        kwargs['namespace'] = "openshift"
+
+        registry = get_registry(kwargs)
+        tag = registry + "/" + kwargs['namespace'] + "/" + spec['name']
+        images.append(tag)
+
+        for image in images:
+            delete_old_images(image)
+
+        bootstrap(
+            kwargs["broker"],
+            kwargs.get("basic_auth_username"),
+            kwargs.get("basic_auth_password"),
+            kwargs.get("auth_token"),
+            kwargs["verify"], cert=kwargs["cert"]
+        )
+        exit()
+    else:
+        raise Exception("No flag specified.  Use --id or --local.")
+
+    response = broker_request(kwargs["broker"], route, "delete",
+                              verify=kwargs["verify"], cert=kwargs["cert"],
+                              basic_auth_username=kwargs.get("basic_auth_username"),
+                              basic_auth_password=kwargs.get("basic_auth_password"),
+                              auth_token=kwargs.get("auth_token"))
+
+    if response.status_code == 404:
+        print("Received a 404 trying to remove APB with id: %s" % kwargs["id"])
+        print("Attempting to contact 3.7 endpoint before erroring out.")
+        response = broker_request(kwargs["broker"], old_route, "delete",
+                                  verify=kwargs["verify"], cert=kwargs["cert"],
+                                  basic_auth_username=kwargs.get("basic_auth_username"),
+                                  basic_auth_password=kwargs.get("basic_auth_password"),
+                                  auth_token=kwargs.get("auth_token"))
+
+    if response.status_code != 204:
+        print("Error: Attempt to remove an APB from Broker returned status: %d" % response.status_code)
+        print("Unable to remove APB from Ansible Service Broker.")
+        exit(1)
+
+    forget_catalog(kwargs["broker"])
+    if not kwargs['no_relist']:
+        relist_service_broker(kwargs)
+
+    print("Successfully deleted APB")
+
+
+def remove_all_local(**kwargs):
+    """
+    Delete every *-apb image from the internal registry: list the images
+    once, then delete their unique digests concurrently.
+    """
+    configure_cluster_context(kwargs.get('workers'))
+    print("Attempting to remove all registry images ending in: *-apb")
+    index = get_registry_image_index()
+    digests = set()
+    for repository in index.repositories():
+        if "-apb" in repository:
+            for image_fqn, image_sha in index.lookup(repository):
+                print("Found image: %s@%s" % (image_fqn, image_sha))
+                digests.add(image_sha)
+
+    if not digests:
+        print("No APB images found in the registry.")
+        return
+
+    dry_run = kwargs.get('dry_run', False)
+    print("%s %d images" % ("Dry run, not deleting" if dry_run else "Deleting", len(digests)))
+    failures = delete_registry_images(digests, kwargs.get('workers') or 1, dry_run)
+    if dry_run:
+        return
+
+    print("Deleted %d of %d images" % (len(digests) - len(failures), len(digests)))
+    bootstrap(
+        kwargs["broker"],
+        kwargs.get("basic_auth_username"),
+        kwargs.get("basic_auth_password"),
+        kwargs.get("auth_token"),
+        kwargs["verify"], cert=kwargs["cert"]
+    )
+    if failures:
+        print("Failed to delete %d images, try: `oc get images`." % len(failures))
+        exit(1)
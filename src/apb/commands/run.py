@@ -0,0 +1,83 @@
+""" run subcommand """
+from apb.cluster import get_registry, run_apb, watch_pod
+from apb.image import build_apb, push_apb
+from apb.spec import get_project
+
+# Handle input in 2.x/3.x
+try:
+    input = raw_input
+except NameError:
+    pass
+
+
+def cmdrun_run(**kwargs):
+    apb_project = get_project(kwargs['base_path'])
+    registry = get_registry(kwargs)
+    spec = apb_project.spec()
+    tag = registry + "/" + kwargs['namespace'] + "/" + spec['name']
+
+    image = build_apb(
+        apb_project,
+        kwargs['dockerfile'],
+        tag,
+        force=kwargs.get('force_rebuild', False)
+    )
+    push_apb(registry, tag, **kwargs)
+
+    plans = [plan['name'] for plan in spec['plans']]
+    if len(plans) > 1:
+        plans_str = ', '.join(plans)
+        while True:
+            try:
+                plan = plans.index(input("Select plan [{}]: ".format(plans_str)))
+                break
+            except ValueError:
+                print("ERROR: Please enter valid plan")
+    else:
+        plan = 0
+
+    parameters = {
+        '_apb_plan_id': spec['plans'][plan]['name'],
+    }
+    for parm in spec['plans'][plan]['parameters']:
+        while True:
+            # Get the value for the parameter
+            val = input("{}{}{}: ".format(
+                parm['name'],
+                "(required)" if 'required' in parm and parm['required'] else '',
+                "[default: {}]".format(parm['default']) if 'default' in parm else ''
+            ))
+            # Take the value if something
+            if val:
+                break
+            else:
+                # Take the default if nothing
+                if 'default' in parm:
+                    val = parm['default']
+                    break
+                # If not required move on
+                if ('required' not in parm) or (not parm['required']):
+                    break
+                # Tell the user if the parameter is required
+                if 'default' not in parm and 'required' in parm and parm['required']:
+                    print("ERROR: Please provide value for required parameter")
+        parameters[parm['name']] = val
+
+    name, namespace = run_apb(
+        project=kwargs['project'],
+        image=image,
+        name='apb-run-{}-{}'.format(kwargs['action'], spec['name']),
+        action=kwargs['action'],
+        parameters=parameters
+    )
+    if not name or not namespace:
+        print("Failed to run apb")
+        return
+
+    print("APB run started")
+    try:
+        pod_completed = watch_pod(name, namespace, kwargs.get('timeout'), kwargs.get('log_file'))
+        print("APB run complete: {}".format(pod_completed))
+    except Exception as e:
+        print("APB run failed: {}".format(e))
+        exit(1)
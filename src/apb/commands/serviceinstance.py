@@ -0,0 +1,44 @@
+""" serviceinstance subcommand """
+import yaml
+
+from apb.spec import get_spec
+
+
+def cmdrun_serviceinstance(**kwargs):
+    project = kwargs['base_path']
+    spec = get_spec(project)
+
+    defaultValue = "ansibleplaybookbundle"
+    params = {}
+    plan_names = "(Plans->"
+    first_plan = 0
+    for plan in spec['plans']:
+        plan_names = "%s|%s" % (plan_names, plan['name'])
+
+        # Only save the vars from the first plan
+        if first_plan == 0:
+            print("Only displaying vars from the '%s' plan." % plan['name'])
+            for param in plan['parameters']:
+                try:
+                    if param['required']:
+                        # Save a required param name and set a defaultValue
+                        params[param['name']] = defaultValue
+                except Exception:
+                    pass
+        first_plan += 1
+
+    plan_names = "%s)" % plan_names
+    serviceInstance = dict(apiVersion="servicecatalog.k8s.io/v1beta1",
+                           kind="ServiceInstance",
+                           metadata=dict(
+                               name=spec['name']
+                           ),
+                           spec=dict(
+                               clusterServiceClassExternalName="dh-" + spec['name'],
+                               clusterServicePlanExternalName=plan_names,
+                               parameters=params
+                           )
+                           )
+
+    with open(spec['name'] + '.yaml', 'w') as outfile:
+        yaml.dump(serviceInstance, outfile, default_flow_style=False)
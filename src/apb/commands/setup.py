@@ -0,0 +1,57 @@
+""" setup subcommand """
+from openshift.helper.openshift import OpenShiftObjectHelper
+
+from apb.cluster import create_cluster_role_binding, get_cluster_context
+from apb.image import create_docker_client
+
+
+def cmdrun_setup(**kwargs):
+    try:
+        create_docker_client()
+    except Exception as e:
+        print("Error! Failed to connect to Docker client. Please ensure it is running. Exception: %s" % e)
+        exit(1)
+
+    try:
+        oapi = get_cluster_context().oapi()
+        projlist = oapi.list_project()
+
+    except Exception as e:
+        print("\nError! Failed to list namespaces on OpenShift cluster. Please ensure OCP is running.")
+        print("Exception: %s" % e)
+        exit(1)
+
+    try:
+        helper = OpenShiftObjectHelper(api_version='v1', kind='user')
+        user_body = {'metadata': {'name': 'apb-developer'}}
+        helper.create_object(body=user_body)
+    except Exception as e:
+        print("\nError! Failed to create APB developer user. Exception: %s" % e)
+
+    try:
+        crb = create_cluster_role_binding('apb-development', 'apb-developer')
+        print(crb)
+    except Exception as e:
+        print("\nError! %s" % e)
+
+    broker_installed = False
+    svccat_installed = False
+    proj_default_access = False
+
+    for project in projlist.items:
+        name = project.metadata.name
+        if name == "default":
+            proj_default_access = True
+        elif "ansible-service-broker" in name:
+            broker_installed = True
+        elif "service-catalog" in name:
+            svccat_installed = True
+    if broker_installed is False:
+        print("Error! Could not find OpenShift Ansible Broker namespace. Please ensure that the broker is\
+                installed and that the current logged in user has access.")
+        exit(1)
+    if svccat_installed is False:
+        print("Error! Could not find OpenShift Service Catalog namespace. Please ensure that the Service\
+                Catalog is installed and that the current logged in user has access.")
+    if proj_default_access is False:
+        print("Error! Could not find the Default namespace. Please ensure that the current logged in user has access.")
@@ -0,0 +1,172 @@
+""" test subcommand """
+import re
+import sys
+import time
+import threading
+import yaml
+
+from multiprocessing.pool import ThreadPool
+
+from apb.cluster import configure_cluster_context, delete_project, get_registry, retrieve_test_result, run_apb
+from apb.image import build_apb, push_apb
+from apb.spec import get_project
+from apb.util import rand_str
+
+# Project names have to be valid DNS labels
+MAX_PROJECT_NAME = 63
+
+
+def test_passed(test_result):
+    test_results = test_result.splitlines()
+    return len(test_results) > 0 and "0" in test_results[0]
+
+
+def cmdrun_test(**kwargs):
+    matrix = kwargs.get('all_plans') or kwargs.get('parameter_sets')
+    if matrix:
+        configure_cluster_context(kwargs.get('workers'))
+    project = get_project(kwargs['base_path'])
+    registry = get_registry(kwargs)
+    spec = project.spec()
+    tag = registry + "/" + kwargs['namespace'] + "/" + spec['name']
+
+    build_apb(project, kwargs['dockerfile'], tag, force=kwargs.get('force_rebuild', False))
+    push_apb(registry, tag, **kwargs)
+
+    if matrix:
+        test_matrix(spec, tag, **kwargs)
+        return
+
+    test_name = 'apb-test-{}-{}'.format(spec['name'], rand_str())
+    name, namespace = run_apb(
+        project=test_name,
+        image=tag,
+        name=test_name,
+        action='test'
+    )
+    if not name or not namespace:
+        print("Failed to run apb")
+        return
+
+    test_result = retrieve_test_result(name, namespace, kwargs.get('retrieval', 'signal'), kwargs.get('timeout'))
+    test_results = []
+    if test_result is None:
+        print("Unable to retrieve test result.")
+        delete_project(test_name)
+        return
+    else:
+        test_results = test_result.splitlines()
+
+    if test_passed(test_result):
+        print("Test successfully passed")
+    elif len(test_results) == 0:
+        print("Unable to retrieve test result.")
+    else:
+        print(test_result)
+
+    delete_project(test_name)
+
+
+def load_parameter_sets(path):
+    if path is None:
+        return [{}]
+    with open(path, 'r') as params_file:
+        parameter_sets = yaml.safe_load(params_file)
+    if not isinstance(parameter_sets, list) or \
+            not all(isinstance(params, dict) for params in parameter_sets):
+        raise Exception("Parameter sets file %s must contain a list of mappings" % path)
+    return parameter_sets
+
+
+def test_project_name(spec_name, plan_name, index):
+    suffix = '-{}-{}'.format(index, rand_str())
+    name = 'apb-test-{}-{}'.format(spec_name, plan_name).lower()
+    name = re.sub('[^a-z0-9-]', '-', name)[:MAX_PROJECT_NAME - len(suffix)]
+    return name.rstrip('-') + suffix
+
+
+def test_matrix(spec, tag, **kwargs):
+    """
+    Run the test action once per plan and parameter set, each in its own
+    project, on a bounded pool of workers. Log lines are prefixed with the
+    run they belong to and a summary is printed at the end.
+    """
+    plans = spec['plans'] if kwargs.get('all_plans') else spec['plans'][:1]
+    parameter_sets = load_parameter_sets(kwargs.get('parameter_sets'))
+
+    runs = []
+    for plan in plans:
+        for index, params in enumerate(parameter_sets):
+            parameters = dict((param['name'], param['default'])
+                              for param in plan.get('parameters') or [] if 'default' in param)
+            parameters.update(params)
+            parameters['_apb_plan_id'] = plan['name']
+            label = plan['name'] if len(parameter_sets) == 1 else '{}#{}'.format(plan['name'], index)
+            runs.append({
+                'label': label,
+                'project': test_project_name(spec['name'], plan['name'], index),
+                'parameters': parameters,
+            })
+
+    output_lock = threading.Lock()
+
+    def run_one(run):
+        prefix = '[{}] '.format(run['label']).encode('utf-8')
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+
+        def on_line(line):
+            with output_lock:
+                sys.stdout.flush()
+                output.write(prefix + line)
+                output.flush()
+
+        result = {'label': run['label'], 'status': 'ERROR', 'seconds': 0.0}
+        start = time.time()
+        try:
+            name, namespace = run_apb(
+                project=run['project'],
+                image=tag,
+                name=run['project'],
+                action='test',
+                parameters=run['parameters']
+            )
+            if name and namespace:
+                test_result = retrieve_test_result(name, namespace, kwargs.get('retrieval', 'signal'),
+                                                   kwargs.get('timeout'), on_line)
+                if test_result is None:
+                    result['status'] = 'NO RESULT'
+                elif test_passed(test_result):
+                    result['status'] = 'PASSED'
+                else:
+                    result['status'] = 'FAILED'
+                    result['output'] = test_result
+        except Exception as e:
+            result['output'] = str(e)
+        finally:
+            try:
+                delete_project(run['project'])
+            except Exception:
+                pass
+        result['seconds'] = time.time() - start
+        return result
+
+    print("Running %d test runs for %s" % (len(runs), spec['name']))
+    pool = ThreadPool(max(1, min(kwargs.get('workers') or 1, len(runs))))
+    try:
+        results = pool.map(run_one, runs)
+    finally:
+        pool.close()
+
+    width = max([len(result['label']) for result in results] + [len('RUN')]) + 2
+    template = "{label:%d}{seconds:>9}  {status}" % width
+    print(template.format(label="RUN", seconds="TIME", status="RESULT"))
+    for result in results:
+        print(template.format(label=result['label'], seconds="%.1fs" % result['seconds'],
+                              status=result['status']))
+    for result in results:
+        if result.get('output'):
+            print("\n[{}] {}:\n{}".format(result['label'], result['status'], result['output']))
+
+    if any(result['status'] != 'PASSED' for result in results):
+        exit(1)
+    print("All %d test runs passed" % len(results))
@@ -0,0 +1,42 @@
+""" validate subcommand """
+from multiprocessing import Pool, cpu_count
+
+from apb.spec import find_apb_projects, validate_project
+
+
+def cmdrun_validate(**kwargs):
+    """
+    Validate the spec of every APB under the project path, on a process pool
+    when there is more than one, and print every error found, followed by a
+    summary.
+    """
+    root = kwargs['base_path']
+    projects = find_apb_projects(root)
+    if not projects:
+        print("No APB projects found under %s" % root)
+        exit(1)
+
+    workers = min(kwargs.get('workers') or cpu_count(), len(projects))
+    if workers <= 1:
+        results = [validate_project(project) for project in projects]
+    else:
+        pool = Pool(workers)
+        try:
+            results = pool.map(validate_project, projects, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+
+    invalid = 0
+    for project, errors in results:
+        if not errors:
+            continue
+        invalid += 1
+        print("%s:" % project)
+        for pointer, message in errors:
+            print("  %s: %s" % (pointer or '/', message))
+
+    print("Validated %d APB specs under %s: %d valid, %d invalid" %
+          (len(results), root, len(results) - invalid, invalid))
+    if invalid:
+        exit(1)
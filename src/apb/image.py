@@ -0,0 +1,407 @@
+""" image module with helpers that build and push APB images with docker """
+import os
+import json
+import time
+import fnmatch
+import tarfile
+import tempfile
+import docker
+import docker.errors
+import docker.utils
+
+from multiprocessing.pool import ThreadPool
+
+from apb.cluster import delete_old_images, get_cluster_context, is_minishift
+from apb.spec import CONTENT_HASH_LABEL, content_hash, get_project, update_dockerfile
+
+DEFAULT_WORKERS = 4
+DOCKERIGNORE = '.dockerignore'
+
+
+def dockerfile_sources(project, dockerfile):
+    """
+    Return the context paths the COPY and ADD instructions of the Dockerfile
+    read from, or None when they cannot be worked out without building (build
+    args in a path, or the whole context being copied).
+    """
+    with open(os.path.join(project, dockerfile), 'r') as dockerfile_file:
+        lines = dockerfile_file.read().splitlines()
+
+    instructions = []
+    current = ''
+    for line in lines:
+        if not current and line.strip().startswith('#'):
+            continue
+        if line.rstrip().endswith('\\'):
+            current += line.rstrip()[:-1] + ' '
+            continue
+        instructions.append((current + line).strip())
+        current = ''
+    if current:
+        instructions.append(current.strip())
+
+    sources = []
+    for instruction in instructions:
+        parts = instruction.split(None, 1)
+        if len(parts) < 2 or parts[0].upper() not in ('COPY', 'ADD'):
+            continue
+        args = parts[1]
+        flags = []
+        while args.startswith('--'):
+            flag, _, args = args.partition(' ')
+            flags.append(flag)
+            args = args.lstrip()
+        if any(flag.startswith('--from') for flag in flags):
+            # Copied from another build stage, not from the context
+            continue
+        if args.startswith('['):
+            args = json.loads(args)
+        else:
+            args = args.split()
+        for source in args[:-1]:
+            if '://' in source:
+                continue
+            if '$' in source:
+                return None
+            source = os.path.normpath(source.lstrip('/'))
+            if source == '.':
+                return None
+            sources.append(source)
+    return sources
+
+
+def context_paths(project, dockerfile):
+    """
+    Return the sorted context paths an image is built from: the files the
+    Dockerfile copies plus the Dockerfile itself, minus whatever
+    .dockerignore excludes. When the copied files cannot be worked out, this
+    is the whole context directory.
+    """
+    patterns = []
+    ignore_path = os.path.join(project, DOCKERIGNORE)
+    if os.path.exists(ignore_path):
+        with open(ignore_path, 'r') as ignore_file:
+            patterns = [line.strip() for line in ignore_file
+                        if line.strip() and not line.startswith('#')]
+
+    sources = dockerfile_sources(project, dockerfile)
+
+    def copied(path):
+        if sources is None or path in (dockerfile, DOCKERIGNORE):
+            return True
+        parts = path.split('/')
+        for depth in range(1, len(parts) + 1):
+            prefix = '/'.join(parts[:depth])
+            if any(fnmatch.fnmatch(prefix, source) for source in sources):
+                return True
+        return False
+
+    return sorted(path for path in docker.utils.exclude_paths(project, patterns, dockerfile=dockerfile)
+                  if copied(path))
+
+
+def build_context(project, dockerfile, paths=None):
+    """
+    Write a tar build context holding `paths`, by default context_paths(), to
+    a temporary file. Returns the open file, rewound, with the number of
+    entries and the size in bytes. The file is streamed to the daemon, so
+    the context is never held in memory.
+    """
+    if paths is None:
+        paths = context_paths(project, dockerfile)
+
+    context = tempfile.TemporaryFile()
+    with tarfile.open(fileobj=context, mode='w') as tar:
+        for path in paths:
+            tar.add(os.path.join(project, path), arcname=path, recursive=False)
+    size = context.tell()
+    context.seek(0)
+    return context, len(paths), size
+
+
+def format_size(size):
+    if size < 1024:
+        return "%d B" % size
+    for unit in ['KiB', 'MiB', 'GiB']:
+        size /= 1024.0
+        if size < 1024 or unit == 'GiB':
+            return "%.1f %s" % (size, unit)
+
+
+def find_built_image(client, digest):
+    images = client.images.list(filters={'label': '%s=%s' % (CONTENT_HASH_LABEL, digest)})
+    return images[0] if images else None
+
+
+def tag_image(image, tag):
+    repository, _, version = tag.rpartition(':')
+    if not repository or '/' in version:
+        # The colon belongs to a registry port, not to a tag
+        repository, version = tag, None
+    image.tag(repository, version)
+
+
+def stream_build(client, tag, prefix='', **build_kwargs):
+    """
+    Build through the low-level API, printing the build output as it
+    arrives. Returns the build stats: total seconds and the duration of every
+    Dockerfile step.
+    """
+    stats = {'tag': tag, 'seconds': 0.0, 'skipped': False, 'image': None, 'steps': []}
+    start = time.time()
+    step = None
+    for chunk in client.api.build(tag=tag, decode=True, rm=True, **build_kwargs):
+        if 'error' in chunk:
+            raise docker.errors.BuildError(chunk['error'], [chunk])
+        if 'aux' in chunk and 'ID' in chunk['aux']:
+            stats['image'] = chunk['aux']['ID']
+        for line in chunk.get('stream', '').splitlines():
+            if line.startswith('Step '):
+                now = time.time()
+                if step is not None:
+                    step['seconds'] = now - step['start']
+                step = {'step': line, 'start': now, 'seconds': 0.0}
+                stats['steps'].append(step)
+            if line.strip():
+                print(prefix + line)
+    if step is not None:
+        step['seconds'] = time.time() - step['start']
+    for step in stats['steps']:
+        del step['start']
+    stats['seconds'] = time.time() - start
+    return stats
+
+
+def stream_push(client, tag, prefix=''):
+    """
+    Push through the low-level API, printing every change of a layer's
+    status. Returns the push stats: total seconds and bytes, the pushed
+    digest and the duration and size of every layer.
+    """
+    stats = {'tag': tag, 'seconds': 0.0, 'bytes': 0, 'digest': None, 'layers': []}
+    layers = {}
+    start = time.time()
+    for chunk in client.api.push(tag, stream=True, decode=True):
+        if 'error' in chunk:
+            raise Exception("Failed to push %s: %s" % (tag, chunk['error']))
+        if 'aux' in chunk and 'Digest' in chunk['aux']:
+            stats['digest'] = chunk['aux']['Digest']
+        if 'id' not in chunk:
+            continue
+
+        status = chunk.get('status', '')
+        layer = layers.get(chunk['id'])
+        if layer is None:
+            layer = {'id': chunk['id'], 'status': None, 'bytes': 0, 'seconds': 0.0, 'start': None}
+            layers[chunk['id']] = layer
+            stats['layers'].append(layer)
+        if status == 'Pushing':
+            if layer['start'] is None:
+                layer['start'] = time.time()
+            layer['bytes'] = max(layer['bytes'], chunk.get('progressDetail', {}).get('current', 0))
+        elif status == 'Pushed' and layer['start'] is not None:
+            layer['seconds'] = time.time() - layer['start']
+        if status != layer['status']:
+            layer['status'] = status
+            print("%s%s: %s" % (prefix, layer['id'], status))
+
+    for layer in stats['layers']:
+        del layer['start']
+        stats['bytes'] += layer['bytes']
+    stats['seconds'] = time.time() - start
+    return stats
+
+
+def format_stats(stats):
+    """ One line describing the build or push stats returned by stream_build/stream_push """
+    if 'layers' in stats:
+        return "pushed %s in %.1fs, %s sent across %d layers" % (
+            stats['tag'], stats['seconds'], format_size(stats['bytes']),
+            len([layer for layer in stats['layers'] if layer['bytes']]))
+    if stats['skipped']:
+        return "skipped build of %s, content unchanged" % stats['tag']
+    slowest = max(stats['steps'], key=lambda step: step['seconds']) if stats['steps'] else None
+    line = "built %s in %.1fs over %d steps" % (stats['tag'], stats['seconds'], len(stats['steps']))
+    if slowest is not None:
+        line += ", slowest %.1fs: %s" % (slowest['seconds'], slowest['step'])
+    return line
+
+
+def write_stats(path, stats):
+    with open(path, 'w') as stats_file:
+        json.dump(stats, stats_file, indent=4, sort_keys=True)
+    print("Wrote build stats to %s" % path)
+
+
+def build_apb(project, dockerfile=None, tag=None, client=None, force=False, stats=None, prefix=''):
+    if dockerfile is None:
+        dockerfile = "Dockerfile"
+    project = get_project(project)
+    spec = project.spec()
+    if 'version' not in spec:
+        print("APB spec does not have a listed version. Please update apb.yml")
+        exit(1)
+
+    if not tag:
+        tag = spec['name']
+
+    update_dockerfile(project, dockerfile)
+    paths = context_paths(project.path, dockerfile)
+    digest = content_hash(project, paths)
+
+    try:
+        if client is None:
+            client = create_docker_client()
+
+        image = None if force else find_built_image(client, digest)
+        if image is not None:
+            if tag not in image.tags and tag + ':latest' not in image.tags:
+                tag_image(image, tag)
+            print("%sAPB is unchanged since image %s was built, skipping build of [%s]" %
+                  (prefix, image.short_id, tag))
+            if stats is not None:
+                stats['build'] = {'tag': tag, 'seconds': 0.0, 'skipped': True, 'image': image.id, 'steps': []}
+            return tag
+
+        context, entries, size = build_context(project.path, dockerfile, paths)
+        print("%sBuilding APB using tag: [%s], sending %d files (%s) as build context" %
+              (prefix, tag, entries, format_size(size)))
+        try:
+            build_stats = stream_build(client, tag, prefix, fileobj=context, custom_context=True,
+                                       dockerfile=dockerfile, labels={CONTENT_HASH_LABEL: digest})
+        finally:
+            context.close()
+    except docker.errors.DockerException:
+        print("Error accessing the docker API. Is the daemon running?")
+        raise
+
+    print("%sSuccessfully %s" % (prefix, format_stats(build_stats)))
+    if stats is not None:
+        stats['build'] = build_stats
+    return tag
+
+
+def build_projects(projects, dockerfile=None, tag_prefix='', workers=DEFAULT_WORKERS,
+                   registry=None, auth_token=None, force=False):
+    """
+    Build every project on a pool of at most `workers` threads sharing one
+    docker client. Each image is tagged `tag_prefix` + the spec name. When
+    `registry` is given, the client logs in once and every image is pushed
+    right after it is built. Returns one result dict per project, in the
+    order given.
+    """
+    client = create_docker_client()
+    if registry is not None:
+        registry_login(client, registry, auth_token)
+
+    def build(project):
+        result = {'project': project, 'tag': None, 'seconds': 0.0, 'error': None,
+                  'build_seconds': None, 'push_seconds': None, 'stats': {}}
+        start = time.time()
+        try:
+            name = get_project(project).spec()['name']
+            tag = tag_prefix + name
+            prefix = '[%s] ' % name
+            result['tag'] = build_apb(project, dockerfile, tag, client, force, result['stats'], prefix)
+            result['build_seconds'] = time.time() - start
+            if registry is not None:
+                push_image(client, tag, result['stats'], prefix)
+                result['push_seconds'] = time.time() - start - result['build_seconds']
+        except (Exception, SystemExit) as e:
+            # build_apb exits on an invalid spec, which must not take down
+            # the worker thread
+            result['error'] = str(e) or e.__class__.__name__
+        result['seconds'] = time.time() - start
+        return result
+
+    pool = ThreadPool(max(1, min(workers, len(projects))))
+    try:
+        return pool.map(build, projects)
+    finally:
+        pool.close()
+
+
+def print_build_summary(results):
+    def duration(seconds):
+        return "-" if seconds is None else "%.1fs" % seconds
+
+    pushed = any(result['push_seconds'] is not None for result in results)
+    width = max([len(result['project']) for result in results] + [len('PROJECT')]) + 2
+    if pushed:
+        template = "{project:%d}{build:>9}{push:>9}{seconds:>9}  {result}" % width
+    else:
+        template = "{project:%d}{seconds:>9}  {result}" % width
+    print(template.format(project="PROJECT", build="BUILD", push="PUSH", seconds="TIME", result="RESULT"))
+    for result in results:
+        print(template.format(
+            project=result['project'],
+            build=duration(result['build_seconds']),
+            push=duration(result['push_seconds']),
+            seconds=duration(result['seconds']),
+            result=result['tag'] if result['error'] is None else "FAILED: %s" % result['error']
+        ))
+
+
+def registry_login(client, registry, auth_token=None):
+    if auth_token is not None:
+        token = auth_token
+    else:
+        api_key = get_cluster_context().api_key()
+        if api_key is None:
+            raise Exception(
+                "No api key found in kubeconfig. NOTE: " +
+                "system:admin *cannot* be used with apb, since it " +
+                "does not have a token."
+            )
+        token = api_key.split(" ")[1]
+    username = "developer" if is_minishift() else "unused"
+    client.login(username=username, password=token, registry=registry, reauth=True)
+
+
+def push_image(client, tag, stats=None, prefix=''):
+    delete_old_images(tag)
+
+    print("%sPushing the image %s" % (prefix, tag))
+    push_stats = stream_push(client, tag, prefix)
+    print("%sSuccessfully %s" % (prefix, format_stats(push_stats)))
+    if stats is not None:
+        stats['push'] = push_stats
+
+
+def push_apb(registry, tag, stats=None, **kwargs):
+    try:
+        client = create_docker_client()
+        registry_login(client, registry, kwargs['auth_token'])
+        push_image(client, tag, stats)
+    except docker.errors.DockerException:
+        print("Error accessing the docker API. Is the daemon running?")
+        raise
+    except docker.errors.APIError:
+        print("Failed to login to the docker API.")
+        raise
+
+
+def create_docker_client():
+    # In order to build and push to the minishift registry, it's required that
+    # users have configured their shell to use the minishift docker daemon
+    # instead of a local daemon:
+    # https://docs.openshift.org/latest/minishift/using/docker-daemon.html
+    if is_minishift():
+        cert_path = os.environ.get('DOCKER_CERT_PATH')
+        docker_host = os.environ.get('DOCKER_HOST')
+        if docker_host is None or cert_path is None:
+            raise Exception("Attempting to target minishift, but missing required \
+                            env vars. Try running: \"eval $(minishift docker-env)\"")
+        client_cert = os.path.join(cert_path, 'cert.pem')
+        client_key = os.path.join(cert_path, 'key.pem')
+        ca_cert = os.path.join(cert_path, 'ca.pem')
+        tls = docker.tls.TLSConfig(
+            ca_cert=ca_cert,
+            client_cert=(client_cert, client_key),
+            verify=True,
+            assert_hostname=False
+        )
+        client = docker.DockerClient(tls=tls, base_url=docker_host, version='auto')
+    else:
+        client = docker.DockerClient(base_url='unix://var/run/docker.sock', version='auto')
+    return client
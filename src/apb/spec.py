@@ -0,0 +1,430 @@
+""" spec module for loading and validating apb.yml and its Dockerfile label """
+import os
+import uuid
+import base64
+import hashlib
+import threading
+import subprocess
+
+from ruamel.yaml import YAML
+
+from apb.util import write_file_atomic
+
+ROLES_DIR = 'roles'
+
+SPEC_FILE = 'apb.yml'
+SPEC_FILE_PARAM_OPTIONS = ['name', 'description', 'type', 'default']
+ASYNC_OPTIONS = ['required', 'optional', 'unsupported']
+
+DOCKERFILE = 'Dockerfile'
+
+SPEC_LABEL = 'com.redhat.apb.spec'
+VERSION_LABEL = 'com.redhat.apb.version'
+CONTENT_HASH_LABEL = 'com.redhat.apb.content-hash'
+
+
+def load_dockerfile(df_path):
+    with open(df_path, 'r') as dockerfile:
+        return dockerfile.readlines()
+
+
+def insert_encoded_spec(dockerfile, encoded_spec_lines):
+    """
+    Return the Dockerfile lines with the value of the spec label replaced by
+    encoded_spec_lines, in a single pass. The old value is every line after
+    the label up to the first one ending in a quote. Works on str or bytes
+    lines, as long as both arguments use the same type.
+    """
+    if dockerfile and isinstance(dockerfile[0], bytes):
+        label, quote, line_ends = SPEC_LABEL.encode('ascii'), b'"', b'\r\n'
+    else:
+        label, quote, line_ends = SPEC_LABEL, '"', '\r\n'
+
+    output = []
+    old_value = None
+    lines = iter(dockerfile)
+    for line in lines:
+        output.append(line)
+        if label in line:
+            old_value = []
+            for value_line in lines:
+                old_value.append(value_line)
+                if value_line.rstrip(line_ends).endswith(quote):
+                    break
+            else:
+                # No end to the old value, leave everything after the label alone
+                output.extend(encoded_spec_lines)
+                output.extend(old_value)
+                return output
+            output.extend(encoded_spec_lines)
+            output.extend(lines)
+            break
+
+    if old_value is None:
+        raise Exception(
+            "ERROR: %s missing from dockerfile while inserting spec blob" %
+            SPEC_LABEL
+        )
+    return output
+
+
+def gen_spec_id(spec, spec_path):
+    new_id = str(uuid.uuid4())
+    spec['id'] = new_id
+
+    with open(spec_path, 'r') as spec_file:
+        lines = spec_file.readlines()
+        insert_i = 1 if lines[0] == '---' else 0
+        id_kvp = "id: %s\n" % new_id
+        lines.insert(insert_i, id_kvp)
+
+    with open(spec_path, 'w') as spec_file:
+        spec_file.writelines(lines)
+
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+TYPE_NAMES = {dict: 'a mapping', list: 'a list', bool: 'a boolean', STRING_TYPES: 'a string'}
+
+# Declarative description of a valid apb.yml, compiled into VALIDATE_SPEC.
+# A schema may give the expected `type`, allowed values in `enum`, the
+# `required` keys and a schema per key in `properties` for mappings, and a
+# schema for every element in `items` plus a `unique` key for lists.
+PARAMETER_SCHEMA = {
+    'type': dict,
+    'required': ['name', 'type'],
+    'properties': dict((option, {'type': STRING_TYPES})
+                       for option in SPEC_FILE_PARAM_OPTIONS if option != 'default'),
+}
+
+PLAN_SCHEMA = {
+    'type': dict,
+    'required': ['name', 'description', 'free', 'metadata', 'parameters'],
+    'properties': {
+        'name': {'type': STRING_TYPES},
+        'description': {'type': STRING_TYPES},
+        'free': {'type': bool},
+        'metadata': {'type': dict},
+        'parameters': {'type': list, 'items': PARAMETER_SCHEMA, 'unique': 'name'},
+        'bind_parameters': {'type': list, 'items': PARAMETER_SCHEMA, 'unique': 'name'},
+    },
+}
+
+SPEC_SCHEMA = {
+    'type': dict,
+    'required': ['name', 'description', 'bindable', 'async', 'metadata', 'plans'],
+    'properties': {
+        'name': {'type': STRING_TYPES},
+        'description': {'type': STRING_TYPES},
+        'bindable': {'type': bool},
+        'async': {'enum': ASYNC_OPTIONS},
+        'metadata': {'type': dict},
+        'plans': {'type': list, 'items': PLAN_SCHEMA, 'unique': 'name'},
+    },
+}
+
+
+def json_pointer(path):
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in path)
+
+
+def compile_schema(schema):
+    """
+    Turn a schema into a function check(value, path, errors) that appends a
+    (json pointer, message) tuple to errors for every problem found below
+    path. Nested schemas are compiled once, up front.
+    """
+    checks = []
+
+    if 'type' in schema:
+        expected = schema['type']
+
+        def check_type(value, path, errors):
+            # bool is an int, but an int is not a bool
+            if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+                errors.append((json_pointer(path), "must be %s" % TYPE_NAMES[expected]))
+                return False
+            return True
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((json_pointer(path), "%r is not one of %s" % (value, ', '.join(allowed))))
+                return False
+            return True
+        checks.append(check_enum)
+
+    if 'required' in schema:
+        required = schema['required']
+
+        def check_required(value, path, errors):
+            for key in required:
+                if key not in value:
+                    errors.append((json_pointer(path), "`%s` field not found" % key))
+            return True
+        checks.append(check_required)
+
+    if 'properties' in schema:
+        properties = [(key, compile_schema(subschema)) for key, subschema in sorted(schema['properties'].items())]
+
+        def check_properties(value, path, errors):
+            for key, check in properties:
+                if key in value:
+                    check(value[key], path + [key], errors)
+            return True
+        checks.append(check_properties)
+
+    if 'items' in schema:
+        check_item = compile_schema(schema['items'])
+        unique = schema.get('unique')
+
+        def check_items(value, path, errors):
+            seen = {}
+            for index, item in enumerate(value):
+                check_item(item, path + [index], errors)
+                if unique is None or not isinstance(item, dict) or unique not in item:
+                    continue
+                key = item[unique]
+                if isinstance(key, STRING_TYPES) and key in seen:
+                    errors.append((json_pointer(path + [index, unique]),
+                                   "duplicate %s %r, also used by %s" %
+                                   (unique, key, json_pointer(path + [seen[key]]))))
+                elif isinstance(key, STRING_TYPES):
+                    seen[key] = index
+            return True
+        checks.append(check_items)
+
+    def check(value, path, errors):
+        for step in checks:
+            # A value of the wrong type can't be checked any further
+            if not step(value, path, errors):
+                return
+    return check
+
+
+VALIDATE_SPEC = compile_schema(SPEC_SCHEMA)
+
+
+def validate_spec(spec):
+    """ Return every problem with the spec as (json pointer, message) tuples """
+    errors = []
+    VALIDATE_SPEC(spec, [], errors)
+    return errors
+
+
+def is_valid_spec(spec):
+    errors = validate_spec(spec)
+    for pointer, message in errors:
+        print("Spec is not valid. %s: %s." % (pointer or '/', message))
+    return not errors
+
+
+def validate_project(project):
+    """ Load and validate the spec of one project, returning (path, errors) """
+    try:
+        spec = get_project(project).spec(quiet=True)
+    except Exception as e:
+        return project, [('', "failed to load %s: %s" % (SPEC_FILE, ' '.join(str(e).split())))]
+    return project, validate_spec(spec)
+
+
+def spec_yaml():
+    """
+    Return the YAML instance used to load a spec. Specs are only read, never
+    written back through YAML, so this is the safe loader. It uses the
+    libyaml C parser when ruamel.yaml's C extension is installed and the
+    pure Python parser otherwise.
+    """
+    return YAML(typ='safe')
+
+
+def load_spec_dict(spec_path):
+    with open(spec_path, 'r') as spec_file:
+        return spec_yaml().load(spec_file.read())
+
+
+def load_spec_str(spec_path):
+    with open(spec_path, 'r') as spec_file:
+        return spec_file.read()
+
+
+def content_hash(project, paths):
+    """
+    Hash the inputs of an APB image: the spec and the files at `paths`, the
+    build context relative to the project. File names are part of the hash,
+    so renames change it too.
+    """
+    project = get_project(project)
+    paths = [SPEC_FILE] + sorted(set(paths) - set([SPEC_FILE]))
+
+    sha = hashlib.sha256()
+    for path in paths:
+        full_path = os.path.join(project.path, path)
+        if not os.path.isfile(full_path):
+            continue
+        sha.update(path.replace(os.sep, '/').encode('utf-8') + b'\0')
+        if path == SPEC_FILE:
+            sha.update(project.spec_bytes())
+        else:
+            with open(full_path, 'rb') as content:
+                for chunk in iter(lambda: content.read(65536), b''):
+                    sha.update(chunk)
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def find_apb_projects(root):
+    """ Return every directory under root that contains an apb.yml """
+    projects = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if SPEC_FILE in filenames:
+            projects.append(dirpath)
+            # An APB project is not expected to contain other APBs
+            del dirnames[:]
+            continue
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+    return projects
+
+
+class Project(object):
+    """
+    An APB project directory. The spec file is read once and only parsed when
+    a command asks for it. Both are reused until the file's mtime or size
+    changes; a rewritten file whose content hash did not change keeps its
+    parsed spec. Parsed specs are shared, callers must not modify them.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.spec_path = os.path.join(path, SPEC_FILE)
+        self._lock = threading.RLock()
+        self._stat = None
+        self._bytes = None
+        self._digest = None
+        self._parsed = None
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.spec_path)
+        except OSError:
+            raise Exception('ERROR: Spec file: [ %s ] not found' % self.spec_path)
+        if (stat.st_mtime, stat.st_size) == self._stat:
+            return
+        with open(self.spec_path, 'rb') as spec_file:
+            content = spec_file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest != self._digest:
+            self._parsed = None
+        self._stat = (stat.st_mtime, stat.st_size)
+        self._bytes = content
+        self._digest = digest
+
+    def spec_bytes(self):
+        with self._lock:
+            self._refresh()
+            return self._bytes
+
+    def spec_hash(self):
+        with self._lock:
+            self._refresh()
+            return self._digest
+
+    def spec_str(self):
+        return self.spec_bytes().decode('utf-8')
+
+    def spec(self, quiet=False):
+        """ Return the parsed spec, `quiet` leaves reporting a load failure to the caller """
+        with self._lock:
+            self._refresh()
+            if self._parsed is None:
+                try:
+                    self._parsed = spec_yaml().load(self._bytes.decode('utf-8'))
+                except Exception as e:
+                    if not quiet:
+                        print('ERROR: Failed to load spec!')
+                    raise e
+            return self._parsed
+
+    def invalidate(self):
+        with self._lock:
+            self._stat = None
+            self._digest = None
+            self._parsed = None
+
+
+_projects = {}
+_projects_lock = threading.Lock()
+
+
+def get_project(project):
+    """ Return the Project shared by every caller for a project path """
+    if isinstance(project, Project):
+        return project
+    key = os.path.abspath(project)
+    with _projects_lock:
+        if key not in _projects:
+            _projects[key] = Project(project)
+        return _projects[key]
+
+
+def get_spec(project, output="dict"):
+    project = get_project(project)
+    if output == 'string':
+        return project.spec_str()
+    return project.spec()
+
+
+# NOTE: Splits up an encoded blob into chunks for insertion into Dockerfile
+def make_friendly(blob):
+    """
+    Split a base64 blob (str or bytes) into quoted, backslash continued
+    Dockerfile lines of at most 76 characters each.
+    """
+    line_break = 76
+    if isinstance(blob, bytes):
+        quote, continuation, newline = b'"', b'\\\n', b'\n'
+    else:
+        quote, continuation, newline = u'"', u'\\\n', u'\n'
+
+    chunks = [blob[offset:offset + line_break] for offset in range(0, len(blob), line_break)] or [blob]
+    chunks[0] = quote + chunks[0]
+    chunks[-1] = chunks[-1] + quote
+    return [chunk + continuation for chunk in chunks[:-1]] + [chunks[-1] + newline]
+
+
+def update_dockerfile(project, dockerfile):
+    """
+    Write the encoded spec into the Dockerfile's spec label. The Dockerfile
+    is only rewritten, atomically, when the label actually changes so its
+    mtime stays put for unchanged specs. Returns whether it was written.
+    """
+    project = get_project(project)
+    dockerfile_path = os.path.join(project.path, dockerfile)
+
+    with open(dockerfile_path, 'rb') as dockerfile_file:
+        original = dockerfile_file.read()
+
+    blob = base64.b64encode(project.spec_bytes())
+    updated = b''.join(insert_encoded_spec(original.splitlines(True), make_friendly(blob)))
+    if updated == original:
+        print('Dockerfile is up to date.')
+        return False
+
+    write_file_atomic(updated, dockerfile_path)
+    print('Finished writing dockerfile.')
+    return True
+
+
+def load_source_dependencies(roles_path):
+    print('Trying to guess list of dependencies for APB')
+    cmd = "/bin/grep -R \ image: {} |awk '{print $3}'".format(roles_path)
+    output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, shell=True)
+    if "{{" in output or "}}" in output:
+        print("Detected variables being used for dependent image names. " +
+              "Please double check the dependencies in your spec file.")
+    return output.split('\n')[:-1]
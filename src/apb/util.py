@@ -0,0 +1,69 @@
+""" util module with small filesystem and string helpers """
+import errno
+import os
+import random
+import string
+import tempfile
+
+# Set from the --debug flag by apb.cli
+DEBUG = False
+
+
+def write_file(file_out, destination, force):
+    touch(destination, force)
+    with open(destination, 'w') as outfile:
+        outfile.write(''.join(file_out))
+
+
+def write_file_atomic(content, destination):
+    """
+    Replace destination with content (bytes) through a temp file in the same
+    directory and a rename, so readers never see a partially written file.
+    The permissions of an existing destination are kept.
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        if os.path.exists(destination):
+            os.chmod(tmp_path, os.stat(destination).st_mode & 0o7777)
+        os.rename(tmp_path, destination)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def mkdir_p(path):
+    try:
+        os.makedirs(path)
+    except OSError as exc:
+        if exc.errno == errno.EEXIST and os.path.isdir(path):
+            pass
+        else:
+            raise
+
+
+def touch(fname, force):
+    if os.path.exists(fname):
+        os.utime(fname, None)
+        if force:
+            os.remove(fname)
+            open(fname, 'a').close()
+    else:
+        open(fname, 'a').close()
+
+
+def rand_str(size=5, chars=string.ascii_lowercase + string.digits):
+    return ''.join(random.choice(chars) for _ in range(size))
+
+
+def set_debug(enabled):
+    global DEBUG
+    DEBUG = enabled
+
+
+def debug(msg):
+    if DEBUG:
+        print("DEBUG: %s" % msg)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from apb import cache
+
+
+class FileCacheTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.environ[cache.CACHE_DIR_ENV] = self.tmpdir
+
+    def tearDown(self):
+        del os.environ[cache.CACHE_DIR_ENV]
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_expired_entry(self):
+        # Setup
+        fc = cache.FileCache('routes', ttl=-1)
+        fc.set('ctx', 'https://asb')
+
+        # Test
+        result = fc.get('ctx')
+
+        # Verify
+        self.assertIsNone(result)
+        self.assertEqual(cache.FileCache('routes').get('ctx'), 'https://asb')
+
+    def test_invalidate_only_matching_value(self):
+        # Setup
+        fc = cache.FileCache('routes')
+        fc.set('ctx', 'https://asb')
+
+        # Test
+        fc.invalidate('ctx', 'https://other')
+        kept = fc.get('ctx')
+        fc.invalidate('ctx', 'https://asb')
+
+        # Verify
+        self.assertEqual(kept, 'https://asb')
+        self.assertIsNone(fc.get('ctx'))
+
+    def test_touch_keeps_value(self):
+        # Setup
+        fc = cache.FileCache('catalogs', ttl=60)
+        fc.set('https://asb', {'services': []})
+        entries = fc._load()
+        entries['https://asb']['time'] -= 120
+        fc._save(entries)
+
+        # Test
+        expired = fc.get('https://asb')
+        fc.touch('https://asb')
+
+        # Verify
+        self.assertIsNone(expired)
+        self.assertEqual(fc.get('https://asb'), {'services': []})
+
+    def test_set_unserializable_value(self):
+        # Setup
+        fc = cache.FileCache('registries')
+        fc.set('ctx', '172.30.1.1:5000')
+
+        # Test
+        fc.set('minishift', object())
+
+        # Verify
+        self.assertEqual(fc.get('ctx'), '172.30.1.1:5000')
+        self.assertEqual(os.listdir(self.tmpdir), ['registries.json'])
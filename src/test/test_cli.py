@@ -0,0 +1,20 @@
+from unittest import TestCase
+
+from apb import cli
+
+
+class CliTests(TestCase):
+
+    def test_requested_subcommand_skips_global_option_values(self):
+        # Test
+        result = cli.requested_subcommand(['--debug', '--project', 'list', 'init', 'foo-apb'])
+
+        # Verify
+        self.assertEqual(result, 'init')
+
+    def test_requested_subcommand_unknown(self):
+        # Test
+        result = cli.requested_subcommand(['--token', 'abc', 'frobnicate'])
+
+        # Verify
+        self.assertIsNone(result)
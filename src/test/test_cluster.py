@@ -0,0 +1,66 @@
+import json
+from unittest import TestCase
+
+from apb import cluster
+
+
+class ByteStream(object):
+    """ Stand-in for a urllib3 response that is not preloaded """
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, chunk_size, decode_content=True):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def release_conn(self):
+        pass
+
+
+class LogApi(object):
+    """ Serves one log per connection, the pod runs until the last one """
+
+    def __init__(self, logs):
+        self.logs = logs
+
+    def read_namespaced_pod_log(self, name, namespace, **kwargs):
+        return ByteStream(self.logs.pop(0))
+
+    def read_namespaced_pod(self, name, namespace):
+        phase = 'Running' if self.logs else 'Succeeded'
+        return type('Pod', (), {'status': type('Status', (), {'phase': phase})()})()
+
+
+class ClusterTests(TestCase):
+
+    def setUp(self):
+        self.watch_pod_sleep = cluster.WATCH_POD_SLEEP
+        cluster.WATCH_POD_SLEEP = 0
+
+    def tearDown(self):
+        cluster.WATCH_POD_SLEEP = self.watch_pod_sleep
+
+    def test_iter_json_list_numbers_split_across_chunks(self):
+        # Setup
+        items = [{'size': 1.5}, {'size': 1e10}, -2.25E-3, 12345, True, None, u'café']
+        document = {'kind': 'ImageList', 'items': items, 'metadata': {'continue': 1.75}}
+        body = json.dumps(document).encode('utf-8')
+
+        # Test
+        header = {}
+        result = list(cluster.iter_json_list(ByteStream(body), header, chunk_size=1))
+
+        # Verify
+        self.assertEqual(result, items)
+        self.assertEqual(header, {'kind': 'ImageList', 'metadata': {'continue': 1.75}})
+
+    def test_pod_log_lines_completes_partial_line_after_reconnect(self):
+        # Setup
+        api = LogApi([b'one\ntw', b'one\ntwo\nthr', b'one\ntwo\nthree\nfin'])
+
+        # Test
+        lines = list(cluster.pod_log_lines(api, 'apb', 'ns'))
+
+        # Verify
+        self.assertEqual(lines, [b'one\n', b'two\n', b'three\n', b'fin'])
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from apb import image, spec
+
+
+class FakeImages(object):
+
+    def __init__(self):
+        self.built = []
+
+    def list(self, filters):
+        label, _, value = filters['label'].partition('=')
+        return [built for built in self.built if built.labels.get(label) == value]
+
+
+class FakeImage(object):
+
+    def __init__(self, tag, labels):
+        self.id = self.short_id = 'sha256:%d' % id(self)
+        self.tags = [tag]
+        self.labels = labels
+
+
+class FakeApi(object):
+
+    def __init__(self, images):
+        self.images = images
+
+    def build(self, tag, labels, **kwargs):
+        self.images.built.append(FakeImage(tag, labels))
+        yield {'stream': 'Step 1/1 : FROM centos\n'}
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.images = FakeImages()
+        self.api = FakeApi(self.images)
+
+
+class ImageTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, content):
+        path = os.path.join(self.tmpdir, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_build_apb_rebuilds_when_copied_file_changes(self):
+        # Setup
+        self.write(spec.SPEC_FILE, 'version: 1.0\nname: a-apb\n')
+        self.write(spec.DOCKERFILE, 'FROM centos\nLABEL "%s"=\\\n""\n'
+                   'COPY playbooks /opt/apb/actions\nCOPY files /opt/ansible/files\n' % spec.SPEC_LABEL)
+        self.write('playbooks/provision.yml', '- hosts: localhost\n')
+        self.write('files/settings.conf', 'replicas=1\n')
+        self.write('notes.txt', 'not copied\n')
+        client = FakeClient()
+        image.build_apb(self.tmpdir, tag='a-apb', client=client)
+
+        # Test
+        self.write('notes.txt', 'still not copied\n')
+        image.build_apb(self.tmpdir, tag='a-apb', client=client)
+        skipped = len(client.images.built)
+        self.write('files/settings.conf', 'replicas=2\n')
+        image.build_apb(self.tmpdir, tag='a-apb', client=client)
+
+        # Verify
+        self.assertEqual(skipped, 1)
+        self.assertEqual(len(client.images.built), 2)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from apb import spec
+
+
+class SpecTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def touch_spec(self, *path):
+        directory = os.path.join(self.tmpdir, *path)
+        os.makedirs(directory)
+        open(os.path.join(directory, spec.SPEC_FILE), 'w').close()
+        return directory
+
+    def test_find_apb_projects(self):
+        # Setup
+        a = self.touch_spec('a-apb')
+        b = self.touch_spec('group', 'b-apb')
+        self.touch_spec('a-apb', 'roles', 'nested')
+        self.touch_spec('.git', 'c-apb')
+
+        # Test
+        result = spec.find_apb_projects(self.tmpdir)
+
+        # Verify
+        self.assertEqual(result, [a, b])
+
+    def test_content_hash_tracks_playbooks(self):
+        # Setup
+        project = self.touch_spec('a-apb')
+        os.makedirs(os.path.join(project, 'playbooks'))
+        playbook = os.path.join(project, 'playbooks', 'provision.yml')
+        with open(playbook, 'w') as f:
+            f.write('- hosts: localhost\n')
+        paths = ['playbooks/provision.yml']
+        before = spec.content_hash(project, paths)
+
+        # Test
+        unchanged = spec.content_hash(project, paths)
+        with open(playbook, 'a') as f:
+            f.write('  gather_facts: false\n')
+        changed = spec.content_hash(project, paths)
+
+        # Verify
+        self.assertEqual(before, unchanged)
+        self.assertNotEqual(before, changed)
+
+    def test_project_reparses_only_changed_spec(self):
+        # Setup
+        directory = self.touch_spec('a-apb')
+        spec_path = os.path.join(directory, spec.SPEC_FILE)
+        with open(spec_path, 'w') as f:
+            f.write('name: a-apb\n')
+        project = spec.Project(directory)
+        first = project.spec()
+
+        # Test
+        cached = project.spec()
+        with open(spec_path, 'w') as f:
+            f.write('name: b-apb\n')
+        os.utime(spec_path, (0, 0))
+        changed = project.spec()
+
+        # Verify
+        self.assertIs(first, cached)
+        self.assertEqual(changed['name'], 'b-apb')
+        self.assertIs(spec.get_project(directory), spec.get_project(directory))
+
+    def test_validate_spec_reports_every_error(self):
+        # Setup
+        apb_spec = {
+            'name': 'a-apb', 'description': 'A', 'bindable': False, 'async': 'sometimes', 'metadata': {},
+            'plans': [
+                {'name': 'default', 'free': True, 'metadata': {}, 'parameters': [{'name': 'p'}]},
+                {'name': 'default', 'description': 'B', 'free': True, 'metadata': {}, 'parameters': []},
+            ],
+        }
+
+        # Test
+        errors = spec.validate_spec(apb_spec)
+
+        # Verify
+        self.assertEqual([pointer for pointer, _ in errors], [
+            '/async', '/plans/0', '/plans/0/parameters/0', '/plans/1/name'
+        ])
+        self.assertFalse(spec.is_valid_spec(apb_spec))
+
+    def test_update_dockerfile_skips_unchanged_label(self):
+        # Setup
+        directory = self.touch_spec('a-apb')
+        with open(os.path.join(directory, spec.SPEC_FILE), 'w') as f:
+            f.write('name: a-apb\ndescription: %s\n' % ('x' * 200))
+        dockerfile_path = os.path.join(directory, spec.DOCKERFILE)
+        with open(dockerfile_path, 'w') as f:
+            f.write('FROM centos\nLABEL "%s"=\\\n""\n\nUSER apb\n' % spec.SPEC_LABEL)
+
+        # Test
+        written = spec.update_dockerfile(directory, spec.DOCKERFILE)
+        with open(dockerfile_path, 'rb') as f:
+            first = f.read()
+        rewritten = spec.update_dockerfile(directory, spec.DOCKERFILE)
+
+        # Verify
+        self.assertTrue(written)
+        self.assertFalse(rewritten)
+        lines = first.splitlines()
+        self.assertTrue(lines[2].startswith(b'"') and lines[-3].endswith(b'"'))
+        self.assertTrue(all(len(line) <= 78 for line in lines[2:-2]))
+        self.assertEqual(lines[-2:], [b'', b'USER apb'])